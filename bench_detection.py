@@ -0,0 +1,215 @@
+"""
+Offline benchmark for the HP/MP detection pipeline (no game, no win32).
+
+    python bench_detection.py [--repeat N] [--save-baseline] [--baseline PATH]
+
+Each bundled screenshot (health.png, mana.png, death_screen.png) is
+replayed as a frame and read with the original per-tick path as the
+reference (cv2.cvtColor + inRange, "hsv"; the grayscale threshold,
+"hsv-gray") and with every estimator mode: full pixel count (the color
+table), full count with USE_GRAY_AS_EMPTY, the orb-shaped count and the
+sparse column probe. Auto-find is timed on a synthetic 1080p frame built
+from the same assets.
+
+Per call it reports mean/p99 latency, throughput and the peak memory
+allocated, and for each mode its fill error against the reference
+(gray mode against hsv-gray); errors above FILL_ERROR_WARN points are
+listed. Results are compared with the baseline file when one exists;
+fill values that change or timings that get more than --tolerance slower
+are flagged and the exit status is 1.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+import poeengine as bot
+
+BASELINE_FILE = os.path.join(bot.SCRIPT_DIR, "bench_baseline.json")
+
+ASSETS = [
+    ("health.png", bot.get_health_fill_percentage, "HP_FILL_MODE", "HP_GEOMETRY"),
+    ("mana.png", bot.get_mana_fill_percentage, "MP_FILL_MODE", "MP_GEOMETRY"),
+    # Death dialog, no orb: shows what each mode reads off a non-bar frame
+    ("death_screen.png", bot.get_health_fill_percentage, "HP_FILL_MODE", "HP_GEOMETRY"),
+]
+
+# (label, fill mode, geometry, use gray as empty)
+MODES = [
+    ("count", bot.FILL_MODE_COUNT, bot.GEOMETRY_RECT, False),
+    ("gray", bot.FILL_MODE_COUNT, bot.GEOMETRY_RECT, True),
+    ("orb", bot.FILL_MODE_COUNT, bot.GEOMETRY_ORB, False),
+    ("probe", bot.FILL_MODE_PROBE, bot.GEOMETRY_RECT, False),
+]
+
+ALLOC_REPEAT = 50  # tracemalloc slows calls down, so it gets its own short pass
+FILL_ERROR_WARN = 5.0  # fill points a mode may differ from the reference before it is listed
+
+
+def reference_fill(name, pixels, use_gray=False, tighten=0):
+    """The original per-tick detection: HSV conversion + inRange masks (or gray < 100)."""
+    bgr = cv2.cvtColor(pixels, cv2.COLOR_BGRA2BGR)
+    total = bgr.shape[0] * bgr.shape[1]
+    if use_gray:
+        gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+        return np.sum(gray < bot.GRAY_EMPTY_THRESHOLD) / total * 100
+    hsv = cv2.cvtColor(bgr, cv2.COLOR_BGR2HSV)
+    if name == "mana.png":
+        blue_lo, blue_hi = bot.blue_hue_bounds(tighten)
+        mask = cv2.inRange(hsv, np.array([blue_lo, 50, 50]), np.array([blue_hi, 255, 255]))
+        return cv2.countNonZero(mask) / total * 100
+    red = cv2.bitwise_or(cv2.inRange(hsv, np.array([0, 50, 50]), np.array([10, 255, 255])),
+                         cv2.inRange(hsv, np.array([160, 50, 50]), np.array([180, 255, 255])))
+    green = cv2.inRange(hsv, np.array([40, 50, 50]), np.array([80, 255, 255]))
+    return max(cv2.countNonZero(red), cv2.countNonZero(green)) / total * 100
+
+
+def time_calls(call, repeat):
+    """Return (last result, per-call seconds array, peak bytes allocated per call)."""
+    value = call()  # warm up (builds the color table, geometry caches)
+    samples = np.empty(repeat)
+    for i in range(repeat):
+        start = time.perf_counter()
+        value = call()
+        samples[i] = time.perf_counter() - start
+
+    tracemalloc.start()
+    peak = 0
+    for _ in range(ALLOC_REPEAT):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        call()
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+    return value, samples, peak
+
+
+def result_row(name, mode, value, samples, peak, reference=None):
+    mean = float(samples.mean())
+    return {
+        "name": name,
+        "mode": mode,
+        "value": round(float(value), 2),
+        "error": None if reference is None else round(float(value - reference), 2),
+        "mean_us": round(mean * 1e6, 1),
+        "p99_us": round(float(np.percentile(samples, 99)) * 1e6, 1),
+        "calls_per_s": round(1 / mean) if mean else 0,
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def bench_readers(repeat):
+    rows = []
+    for name, reader, mode_key, geometry_key in ASSETS:
+        frame = bot.ReplayCapture(os.path.join(bot.SCRIPT_DIR, name)).grab([])
+        h, w = frame.pixels.shape[:2]
+        region = [0, 0, w, h]
+        references = {}
+        for use_gray, label in ((False, "hsv"), (True, "hsv-gray")):
+            value, samples, peak = time_calls(
+                lambda: reference_fill(name, frame.pixels, use_gray), repeat)
+            references[use_gray] = value
+            rows.append(result_row(name, label, value, samples, peak))
+        for label, mode, geometry, use_gray in MODES:
+            bot.CONFIG[mode_key] = mode
+            bot.CONFIG[geometry_key] = geometry
+            bot.CONFIG["USE_GRAY_AS_EMPTY"] = use_gray
+            bot.compile_config()
+            value, samples, peak = time_calls(lambda: reader(region, frame), repeat)
+            rows.append(result_row(name, label, value, samples, peak, references[use_gray]))
+    return rows
+
+
+def synthetic_screen():
+    """1920x1080 frame with the HP orb bottom-left, MP orb bottom-right, death dialog centered."""
+    screen = np.full((1080, 1920, 3), 12, np.uint8)
+    for name, x in (("health.png", 60), ("mana.png", 1920 - 60 - 126)):
+        img = cv2.imread(os.path.join(bot.SCRIPT_DIR, name), cv2.IMREAD_COLOR)
+        h, w = img.shape[:2]
+        screen[1080 - 40 - h : 1080 - 40, x : x + w] = img
+    dialog = cv2.imread(os.path.join(bot.SCRIPT_DIR, "death_screen.png"), cv2.IMREAD_COLOR)
+    h, w = dialog.shape[:2]
+    screen[(1080 - h) // 2 : (1080 + h) // 2, (1920 - w) // 2 : (1920 - w) // 2 + w] = dialog
+    return screen
+
+
+def bench_auto_find(repeat):
+    screen = synthetic_screen()
+    store = bot.get_template_store()
+    hp = store.get(*bot.HP_TEMPLATE)
+    mp = store.get(*bot.MP_TEMPLATE)
+    matches, samples, peak = time_calls(
+        lambda: bot.find_hp_mp_templates(screen, hp.variants, mp.variants), repeat)
+    score = min(match.score for match in matches)
+    return [result_row("screen 1080p", "autofind", score, samples, peak)]
+
+
+def compare(rows, baseline, tolerance):
+    """Return a list of regression messages against a saved baseline."""
+    previous = {(row["name"], row["mode"]): row for row in baseline["results"]}
+    problems = []
+    for row in rows:
+        old = previous.get((row["name"], row["mode"]))
+        if old is None:
+            continue
+        label = f"{row['name']} {row['mode']}"
+        if abs(row["value"] - old["value"]) > 0.5:
+            problems.append(f"{label}: value {old['value']} -> {row['value']}")
+        if row["mean_us"] > old["mean_us"] * (1 + tolerance):
+            problems.append(f"{label}: {old['mean_us']} -> {row['mean_us']} us/call")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--autofind-repeat", type=int, default=20)
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="overwrite the baseline with this run")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown before a timing counts as a regression")
+    args = parser.parse_args()
+
+    rows = bench_readers(args.repeat) + bench_auto_find(args.autofind_repeat)
+
+    print(f"{'asset':<18}{'mode':<10}{'value':>8}{'error':>8}{'us/call':>10}{'p99 us':>10}"
+          f"{'calls/s':>10}{'peak KiB':>10}")
+    for row in rows:
+        error = "-" if row.get("error") is None else f"{row['error']:+.1f}"
+        print(f"{row['name']:<18}{row['mode']:<10}{row['value']:>8.1f}{error:>8}{row['mean_us']:>10.1f}"
+              f"{row['p99_us']:>10.1f}{row['calls_per_s']:>10}{row['peak_kib']:>10.1f}")
+
+    off = [row for row in rows if row.get("error") is not None and abs(row["error"]) > FILL_ERROR_WARN]
+    if off:
+        print(f"Modes more than {FILL_ERROR_WARN:g} points off the reference:")
+        for row in off:
+            print(f"  {row['name']} {row['mode']}: {row['value']} vs "
+                  f"{row['value'] - row['error']:.2f} ({row['error']:+.2f})")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({"python": sys.version.split()[0], "numpy": np.__version__,
+                       "opencv": cv2.__version__, "results": rows}, f, indent=4)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            problems = compare(rows, json.load(f), args.tolerance)
+        if problems:
+            print("Regressions against baseline:")
+            for problem in problems:
+                print(f"  {problem}")
+            return 1
+        print(f"No regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""
+Measure detection tick jitter with the detector in a thread vs a child process.
+
+    python bench_jitter.py [--seconds S] [--rate HZ]
+
+The detector loop (run_detector) replays health.png at a fixed rate and
+publishes into the shared-memory ring. It runs either as a thread of this
+process, sharing the GIL like the in-process monitor loop, or as a
+separate process (DETECT_PROCESS). Each case is measured with the "GUI"
+idle and with a busy thread that holds the GIL in bursts, the way Tk
+redraws and keyboard hook callbacks do. Jitter is how far each tick
+interval strays from 1/rate.
+"""
+import argparse
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+import poeengine as bot
+
+
+def busy_gui(stop):
+    """Pure-Python work in 20 ms bursts with short breaks, like a busy Tk thread."""
+    while not stop.is_set():
+        end = time.perf_counter() + 0.02
+        while time.perf_counter() < end:
+            sum(range(1000))
+        time.sleep(0.005)
+
+
+def run_case(mode, busy, seconds, rate):
+    stop_gui = threading.Event()
+    if busy:
+        threading.Thread(target=busy_gui, args=(stop_gui,), daemon=True).start()
+
+    if mode == "process":
+        detector = bot.DetectorProcess(rate=rate)
+        ring, stop = detector.ring, detector.stop
+    else:
+        ring = bot.FillRing()
+        stop_event = threading.Event()
+        worker = threading.Thread(target=bot.run_detector,
+                                  args=(ring.name, dict(bot.CONFIG), queue.Queue(), stop_event, rate),
+                                  daemon=True)
+        worker.start()
+
+        def stop():
+            stop_event.set()
+            worker.join()
+            ring.close()
+
+    samples, last_seq = [], 0
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        time.sleep(0.05)
+        new = ring.since(last_seq)
+        if new:
+            samples.extend(new)
+            last_seq = new[-1].seq
+    stop()
+    stop_gui.set()
+
+    times = np.array([sample.time for sample in samples[1:]])  # first tick includes startup
+    intervals = np.diff(times)
+    deviation = np.abs(intervals - 1.0 / rate) * 1000
+    return {
+        "ticks": len(intervals),
+        "rate": len(intervals) / (times[-1] - times[0]) if len(times) > 1 else 0.0,
+        "p50": float(np.percentile(deviation, 50)),
+        "p99": float(np.percentile(deviation, 99)),
+        "max": float(deviation.max()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--rate", type=float, default=bot.DEFAULT_MAX_TICK_RATE)
+    args = parser.parse_args()
+
+    asset = os.path.join(bot.SCRIPT_DIR, "health.png")
+    h, w = bot.ReplayCapture(asset).grab([]).pixels.shape[:2]
+    bot.CONFIG.update(bot.default_config())
+    bot.CONFIG.update({
+        "CAPTURE_BACKEND": "replay",
+        "REPLAY_PATH": asset,
+        "HP_REGION": [0, 0, w, h],
+        "MP_REGION": [0, 0, w, h],
+        # Do the full detection every tick: the replayed frame never changes
+        "SKIP_UNCHANGED_REGIONS": False,
+    })
+
+    print(f"{'detector':<10}{'gui':<6}{'ticks':>7}{'Hz':>7}"
+          f"{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}   (|interval - 1/rate|)")
+    for mode in ("thread", "process"):
+        for busy in (False, True):
+            r = run_case(mode, busy, args.seconds, args.rate)
+            print(f"{mode:<10}{'busy' if busy else 'idle':<6}{r['ticks']:>7}{r['rate']:>7.1f}"
+                  f"{r['p50']:>9.2f}{r['p99']:>9.2f}{r['max']:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
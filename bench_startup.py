@@ -0,0 +1,206 @@
+"""
+Startup benchmark: time to first window and time to monitoring.
+
+    python bench_startup.py [--repeat N] [--save-baseline] [--baseline PATH]
+
+Every run starts a fresh interpreter, so imports cost what they cost on a
+real launch. Milestones are wall-clock ms since the child was spawned:
+
+  gui     imported     poeautopot imported
+          window       AutoPotionApp built and its window mapped
+          ready        warm-up done (lazy modules loaded, Start enabled)
+          monitoring   first HP/MP reading after pressing Start
+  engine  imported     poeengine imported
+          monitoring   first HP/MP reading from the headless engine
+
+Both cases replay health.png with a temporary config.json, so no game is
+needed; the gui case is skipped where Tk cannot open a display. Medians
+are compared with the baseline file like bench_detection.py does.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_FILE = os.path.join(SCRIPT_DIR, "bench_startup_baseline.json")
+CASES = ("gui", "engine")
+
+
+def write_config(directory):
+    """A config.json that monitors health.png through the replay backend."""
+    import cv2
+    asset = os.path.join(SCRIPT_DIR, "health.png")
+    h, w = cv2.imread(asset).shape[:2]
+    sys.path.insert(0, SCRIPT_DIR)
+    import poeengine as bot
+    config = bot.default_config()
+    config.update({
+        "CAPTURE_BACKEND": "replay",
+        "REPLAY_PATH": asset,
+        "HP_REGION": [0, 0, w, h],
+        "MP_REGION": [0, 0, w, h],
+        # Never press or chicken: only the first reading is timed
+        "THRESHOLD_HP_LOWER": 0, "THRESHOLD_HP_UPPER": 0,
+        "THRESHOLD_MP_LOWER": 0, "THRESHOLD_MP_UPPER": 0,
+        "CHICKEN_ENABLED": False,
+        "DETECT_PROCESS": False,
+    })
+    path = os.path.join(directory, "config.json")
+    with open(path, "w") as f:
+        json.dump(config, f, indent=4)
+    return path
+
+
+# -- child side ----------------------------------------------------------------
+def child_engine(ms, config_path):
+    import poeengine as bot
+    marks = {"imported": ms()}
+    bot.CONFIG_FILE = config_path
+    bot.load_config()
+
+    def publish(**state):
+        if "hp_fill" in state and "monitoring" not in marks:
+            marks["monitoring"] = ms()
+            engine.stop()
+
+    engine = bot.MonitorEngine(bot.FakeWindowTracker(), bot.create_capture_backend(),
+                               input_backend=bot.DryRunInput(lambda msg: None),
+                               log=lambda msg: None, publish=publish)
+    engine.start()
+    engine.run()
+    return marks
+
+
+def child_gui(ms, config_path):
+    import tkinter as tk
+    import poeengine
+    poeengine.CONFIG_FILE = config_path
+    import poeautopot as gui
+    marks = {"imported": ms()}
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        return {"skipped": str(e)}
+    root.bind("<Map>", lambda event: marks.setdefault("window", ms()))
+    app = gui.AutoPotionApp(root)
+
+    publish = app.engine.publish
+    def timed_publish(**state):
+        if "hp_fill" in state:
+            marks.setdefault("monitoring", ms())
+        publish(**state)
+    app.engine.publish = timed_publish
+
+    def poll():
+        if "ready" not in marks and app.toggle_button.instate(["!disabled"]):
+            marks["ready"] = ms()
+            app.toggle_monitoring()
+        if "monitoring" in marks:
+            app.engine.stop()
+            root.destroy()
+            return
+        root.after(1, poll)
+
+    root.after(1, poll)
+    root.mainloop()
+    app.log_sink.close()
+    return marks
+
+
+def run_child(case, t0, config_path):
+    sys.path.insert(0, SCRIPT_DIR)
+    ms = lambda: round((time.time() - t0) * 1000, 1)
+    marks = (child_gui if case == "gui" else child_engine)(ms, config_path)
+    print(json.dumps(marks))
+
+
+# -- parent side -----------------------------------------------------------------
+def spawn(case, config_path):
+    cmd = [sys.executable, os.path.abspath(__file__), "--child", case,
+           "--t0", repr(time.time()), "--config", config_path]
+    out = subprocess.run(cmd, capture_output=True, text=True, cwd=SCRIPT_DIR)
+    lines = out.stdout.strip().splitlines()
+    if out.returncode != 0 or not lines:
+        raise RuntimeError(f"{case} run failed:\n{out.stderr}")
+    return json.loads(lines[-1])
+
+
+def bench(repeat, config_path):
+    rows = []
+    for case in CASES:
+        runs = [spawn(case, config_path) for _ in range(repeat)]
+        if "skipped" in runs[0]:
+            print(f"{case}: skipped ({runs[0]['skipped']})")
+            continue
+        for milestone in runs[0]:
+            values = [run[milestone] for run in runs]
+            rows.append({
+                "case": case,
+                "milestone": milestone,
+                "median_ms": round(statistics.median(values), 1),
+                "max_ms": round(max(values), 1),
+            })
+    return rows
+
+
+def compare(rows, baseline, tolerance):
+    """Return a list of regression messages against a saved baseline."""
+    previous = {(row["case"], row["milestone"]): row for row in baseline["results"]}
+    problems = []
+    for row in rows:
+        old = previous.get((row["case"], row["milestone"]))
+        if old is not None and row["median_ms"] > old["median_ms"] * (1 + tolerance):
+            problems.append(f"{row['case']} {row['milestone']}: "
+                            f"{old['median_ms']} -> {row['median_ms']} ms")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="overwrite the baseline with this run")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown before a milestone counts as a regression")
+    parser.add_argument("--child", choices=CASES, help=argparse.SUPPRESS)
+    parser.add_argument("--t0", type=float, help=argparse.SUPPRESS)
+    parser.add_argument("--config", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.t0, args.config)
+        return 0
+
+    with tempfile.TemporaryDirectory() as directory:
+        rows = bench(args.repeat, write_config(directory))
+
+    print(f"{'case':<8}{'milestone':<12}{'median ms':>10}{'max ms':>10}")
+    for row in rows:
+        print(f"{row['case']:<8}{row['milestone']:<12}{row['median_ms']:>10.1f}{row['max_ms']:>10.1f}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({"python": sys.version.split()[0], "results": rows}, f, indent=4)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            problems = compare(rows, json.load(f), args.tolerance)
+        if problems:
+            print("Regressions against baseline:")
+            for problem in problems:
+                print(f"  {problem}")
+            return 1
+        print(f"No regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,136 +1,35 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
-import cv2
-import pyautogui
+from tkinter import ttk, messagebox, filedialog
 import threading
 import time
-import numpy as np
-import json
-import os
-import win32gui
-from PIL import Image, ImageTk, ImageDraw
-import random
-import keyboard  # For global hotkey detection
-
-SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-CONFIG_FILE = os.path.join(SCRIPT_DIR, "config.json")
-
-# Default thresholds
-DEFAULT_THRESHOLD_HP_LOWER = 55
-DEFAULT_THRESHOLD_HP_UPPER = 65
-DEFAULT_THRESHOLD_MP_LOWER = 55
-DEFAULT_THRESHOLD_MP_UPPER = 65
-
-# Default color/potion/delay
-DEFAULT_COLOR_TIGHTENING = 0
-DEFAULT_HEALTH_POTION_DELAY = 0.5
-DEFAULT_MANA_POTION_DELAY = 0.5
-
-# Default keys
-DEFAULT_TOGGLE_KEY = "F8"
-DEFAULT_PAUSE_KEY = "F9"
-DEFAULT_SINGLE_SCREEN_HOTKEY = "F10"
-
-# Default region not set
-CONFIG = {}
-MONITOR_SLEEP_TIME = 0.2
-
-# Chickening defaults
-DEFAULT_CHICKEN_ENABLED = False
-DEFAULT_CHICKEN_THRESHOLD = 30  # HP% below which to log out quickly
-
-# NEW: Default increase percentage when poisoned (health bar turns green)
-DEFAULT_POISONED_THRESHOLD_INCREASE = 0
-
-# For some older Pillow versions
-try:
-    RESAMPLE_FILTER = Image.Resampling.LANCZOS
-except AttributeError:
-    RESAMPLE_FILTER = Image.ANTIALIAS
+import multiprocessing
+
+# Capture, detection, config and the monitor engine (no Tk) live in poeengine;
+# pyautogui comes from there too (imported only where it is available)
+from poeengine import *
+from poeengine import lazy_import, finish_imports
+
+# Loaded on first use, after the window is up: cv2/numpy with the first frame
+# (or warm_up), PIL only for region selection and the auto-find preview
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+Image = lazy_import("PIL.Image")
+ImageTk = lazy_import("PIL.ImageTk")
+ImageDraw = lazy_import("PIL.ImageDraw")
+keyboard = lazy_import("keyboard")  # For global hotkey detection
+
+# The monitor thread only publishes state; the Tk thread applies it this often
+UI_REFRESH_INTERVAL_MS = 33  # ~30 fps cap
+
+# The Log widget keeps the last LOG_MAX_LINES lines
+LOG_MAX_LINES = 500
+
+PROFILE_REFRESH_MS = 1000  # how often the profiler table is redrawn
 
 
 # ------------------------------------------------------------------------------
-# HELPER FUNCTIONS ADDED (from second snippet for auto-find)
+# Auto-find preview
 # ------------------------------------------------------------------------------
-def list_windows():
-    """Return a list of visible window titles."""
-    windows = []
-    def enum_window(hwnd, _):
-        if win32gui.IsWindowVisible(hwnd):
-            t = win32gui.GetWindowText(hwnd)
-            if t:
-                windows.append(t)
-        return True
-    win32gui.EnumWindows(enum_window, None)
-    return windows
-
-def refine_template_crop(template_img, target_color="red"):
-    """
-    Crop a template image around the main cluster of target_color pixels,
-    so that matchTemplate won't look at empty areas.
-    """
-    hsv = cv2.cvtColor(template_img, cv2.COLOR_BGR2HSV)
-    if target_color.lower() == "red":
-        lower_red1 = np.array([0, 50, 50])
-        upper_red1 = np.array([10, 255, 255])
-        lower_red2 = np.array([160, 50, 50])
-        upper_red2 = np.array([180, 255, 255])
-        mask1 = cv2.inRange(hsv, lower_red1, upper_red1)
-        mask2 = cv2.inRange(hsv, lower_red2, upper_red2)
-        mask = cv2.bitwise_or(mask1, mask2)
-    elif target_color.lower() == "blue":
-        lower_blue = np.array([80, 50, 50])
-        upper_blue = np.array([140, 255, 255])
-        mask = cv2.inRange(hsv, lower_blue, upper_blue)
-    else:
-        return template_img  # no special handling
-
-    kernel = np.ones((3, 3), np.uint8)
-    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel, iterations=2)
-    coords = cv2.findNonZero(mask)
-    if coords is not None:
-        x, y, w, h = cv2.boundingRect(coords)
-        cropped = template_img[y : y + h, x : x + w]
-        return cropped
-    else:
-        return template_img
-
-def crop_by_max_color_column(template_img, target_color="red", slice_width=4, crop_percent=0.05):
-    """
-    Another helper that tries to locate the 'best' vertical slice of the image
-    that has the most of the target color, to reduce noise in the matchTemplate.
-    """
-    hsv = cv2.cvtColor(template_img, cv2.COLOR_BGR2HSV)
-    if target_color.lower() == "red":
-        lower_red1 = np.array([0, 70, 50])
-        upper_red1 = np.array([10, 255, 255])
-        lower_red2 = np.array([160, 70, 50])
-        upper_red2 = np.array([180, 255, 255])
-        mask1 = cv2.inRange(hsv, lower_red1, upper_red1)
-        mask2 = cv2.inRange(hsv, lower_red2, upper_red2)
-        mask = cv2.bitwise_or(mask1, mask2)
-    elif target_color.lower() == "blue":
-        lower_blue = np.array([80, 70, 50])
-        upper_blue = np.array([140, 255, 255])
-        mask = cv2.inRange(hsv, lower_blue, upper_blue)
-    else:
-        return template_img
-
-    col_sums = np.sum(mask > 0, axis=0)
-    max_col_index = int(np.argmax(col_sums))
-    h, w = template_img.shape[:2]
-    left = max(0, max_col_index - slice_width // 2)
-    right = min(w, left + slice_width)
-    cropped = template_img[:, left:right]
-
-    # Optionally remove top/bottom by crop_percent
-    crop_pixels = int(cropped.shape[0] * crop_percent)
-    cropped = cropped[crop_pixels : cropped.shape[0] - crop_pixels, :]
-
-    # Then refine again
-    cropped_refined = refine_template_crop(cropped, target_color=target_color)
-    return cropped_refined
-
 def show_auto_found_popup(screenshot_cv, hp_region, mp_region):
     """
     Shows a small popup window (800x600) with rectangles drawn over the
@@ -198,136 +97,15 @@ def show_auto_found_popup(screenshot_cv, hp_region, mp_region):
     popup.wait_window()
 
 
-# ------------------------------------------------------------------------------
-# Load & Save Config
-# ------------------------------------------------------------------------------
-def load_config():
-    global CONFIG
-    if os.path.exists(CONFIG_FILE):
-        with open(CONFIG_FILE, "r") as f:
-            CONFIG = json.load(f)
-    else:
-        CONFIG = {
-            "HP_REGION": [],
-            "MP_REGION": [],
-            "THRESHOLD_HP_LOWER": DEFAULT_THRESHOLD_HP_LOWER,
-            "THRESHOLD_HP_UPPER": DEFAULT_THRESHOLD_HP_UPPER,
-            "THRESHOLD_MP_LOWER": DEFAULT_THRESHOLD_MP_LOWER,
-            "THRESHOLD_MP_UPPER": DEFAULT_THRESHOLD_MP_UPPER,
-            "COLOR_TIGHTENING": DEFAULT_COLOR_TIGHTENING,
-            "HEALTH_POTION_DELAY": DEFAULT_HEALTH_POTION_DELAY,
-            "MANA_POTION_DELAY": DEFAULT_MANA_POTION_DELAY,
-            "TOGGLE_KEY": DEFAULT_TOGGLE_KEY,
-            "PAUSE_KEY": DEFAULT_PAUSE_KEY,
-            "SINGLE_SCREEN_HOTKEY": DEFAULT_SINGLE_SCREEN_HOTKEY,
-            "USE_GRAY_AS_EMPTY": False,
-            "TARGET_WINDOW_TITLE": "Path of Exile 2",
-            "SHOW_THRESHOLD_OVERLAY": False,
-            "CHICKEN_ENABLED": DEFAULT_CHICKEN_ENABLED,
-            "CHICKEN_THRESHOLD": DEFAULT_CHICKEN_THRESHOLD,
-            # NEW: Poisoned threshold increase percentage
-            "POISONED_THRESHOLD_INCREASE": DEFAULT_POISONED_THRESHOLD_INCREASE
-        }
-        save_config()
-
-def save_config():
-    with open(CONFIG_FILE, "w") as f:
-        json.dump(CONFIG, f, indent=4)
-
-
-# ------------------------------------------------------------------------------
-# Window detection
-# ------------------------------------------------------------------------------
-def get_game_window_rect():
-    """Return (left, top, width, height) for the configured window, or None."""
-    hwnd = win32gui.FindWindow(None, CONFIG.get("TARGET_WINDOW_TITLE","Path of Exile 2"))
-    if hwnd == 0:
-        return None
-    rect = win32gui.GetWindowRect(hwnd)
-    left, top, right, bottom = rect
-    return (left, top, right - left, bottom - top)
-
-
-# ------------------------------------------------------------------------------
-# HP/MP Fill detection (Modified for Poisoned/Green Health)
-# ------------------------------------------------------------------------------
-def get_health_fill_percentage(region):
-    """Return HP fill% from the region. 0 if region is invalid or not found."""
-    if not region or len(region) != 4:
-        return 0
-    screenshot = pyautogui.screenshot(region=tuple(region))
-    frame = cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
-
-    use_gray = CONFIG.get("USE_GRAY_AS_EMPTY", False)
-    if use_gray:
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        threshold_value = 100
-        full_pixels = np.sum(gray < threshold_value)
-        total_pixels = gray.size
-        return (full_pixels / total_pixels) * 100 if total_pixels else 0
-    else:
-        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-        # Red detection (normal health)
-        lower_red1 = np.array([0, 50, 50])
-        upper_red1 = np.array([10, 255, 255])
-        lower_red2 = np.array([160, 50, 50])
-        upper_red2 = np.array([180, 255, 255])
-        mask_red1 = cv2.inRange(hsv, lower_red1, upper_red1)
-        mask_red2 = cv2.inRange(hsv, lower_red2, upper_red2)
-        mask_red = cv2.bitwise_or(mask_red1, mask_red2)
-        
-        # Green detection (poisoned health)
-        lower_green = np.array([40, 50, 50])
-        upper_green = np.array([80, 255, 255])
-        mask_green = cv2.inRange(hsv, lower_green, upper_green)
-        
-        red_pixels = cv2.countNonZero(mask_red)
-        green_pixels = cv2.countNonZero(mask_green)
-        total_pixels = mask_red.shape[0] * mask_red.shape[1]
-        if total_pixels:
-            red_fill = (red_pixels / total_pixels) * 100
-            green_fill = (green_pixels / total_pixels) * 100
-        else:
-            return 0
-        
-        # Determine if the health bar is poisoned (green dominates)
-        is_poisoned = green_pixels > red_pixels
-        CONFIG["IS_POISONED"] = is_poisoned  # Save state to use in the monitor loop
-        
-        # Return fill percentage from the dominant color
-        return green_fill if is_poisoned else red_fill
-
-def get_mana_fill_percentage(region):
-    """Return MP fill% from the region. 0 if region is invalid or not found."""
-    if not region or len(region) != 4:
-        return 0
-    screenshot = pyautogui.screenshot(region=tuple(region))
-    frame = cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
-
-    use_gray = CONFIG.get("USE_GRAY_AS_EMPTY", False)
-    if use_gray:
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        threshold_value = 100
-        full_pixels = np.sum(gray < threshold_value)
-        total_pixels = gray.size
-        return (full_pixels / total_pixels) * 100 if total_pixels else 0
-    else:
-        tighten = CONFIG.get("COLOR_TIGHTENING", 0)
-        center_blue = 110
-        half_width_blue = 30 * (1 - tighten/100)
-        new_lower_blue = np.array([max(80,int(center_blue-half_width_blue)), 50, 50])
-        new_upper_blue = np.array([min(140,int(center_blue+half_width_blue)), 255, 255])
-        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-        mask = cv2.inRange(hsv, new_lower_blue, new_upper_blue)
-        blue_pixels = cv2.countNonZero(mask)
-        total_pixels = mask.shape[0] * mask.shape[1]
-        return (blue_pixels / total_pixels) * 100 if total_pixels else 0
-
-
 # ------------------------------------------------------------------------------
 # DualThresholdFillSlider
 # ------------------------------------------------------------------------------
 class DualThresholdFillSlider(tk.Canvas):
+    """
+    Fill bar with two draggable threshold markers. Canvas items are created
+    once and draw() only moves/re-labels the ones whose value changed, so a
+    set_fill() per tick costs a couple of item updates at most.
+    """
     def __init__(self, master, width=250, height=30, fill_color="red",
                  label_text="HP",
                  lower_initial=55, upper_initial=65,
@@ -348,41 +126,67 @@ class DualThresholdFillSlider(tk.Canvas):
         self.bind("<B1-Motion>", self.on_drag)
         self.bind("<ButtonRelease-1>", self.on_release)
 
-        self.draw()
-
-    def draw(self):
-        self.delete("all")
         # background
         self.create_rectangle(0,0,self.width,self.height,
                               fill="lightgray", outline="")
+        # fill, threshold lines, text, random line
+        self.fill_item = self.create_rectangle(0,0,0,self.height,
+                                               fill=self.fill_color, outline="")
+        self.lower_line = self.create_line(0,0,0,self.height, fill="black", width=2)
+        self.upper_line = self.create_line(0,0,0,self.height, fill="black", width=2)
+        self.label_item = self.create_text(self.width/2, self.height/2, text="",
+                                           fill="white", font=("Arial",10))
+        self.lower_text = self.create_text(0, -5, text="", fill="black", font=("Arial",8))
+        self.upper_text = self.create_text(0, -5, text="", fill="black", font=("Arial",8))
+        self.random_line = self.create_line(0,0,0,self.height, fill="lime", width=2,
+                                            dash=(3,2), state="hidden")
+
+        # What each item currently shows, to skip no-op updates
+        self._shown = {}
+        self._notified = None
+        self.draw()
+
+    def _update(self, key, value, apply):
+        if self._shown.get(key) != value:
+            self._shown[key] = value
+            apply(value)
+
+    def draw(self):
         # fill
-        fill_w = (self.current_fill / 100)*self.width
-        self.create_rectangle(0,0, fill_w, self.height,
-                              fill=self.fill_color, outline="")
+        fill_w = round((self.current_fill / 100)*self.width)
+        self._update("fill", fill_w,
+                     lambda w: self.coords(self.fill_item, 0, 0, w, self.height))
+        self._update("label", f"{self.label_text}: {self.current_fill:.0f}%",
+                     lambda t: self.itemconfig(self.label_item, text=t))
 
         # threshold lines
         l_x = (self.lower_threshold / 100)*self.width
         u_x = (self.upper_threshold / 100)*self.width
-        self.create_line(l_x,0,l_x,self.height, fill="black", width=2)
-        self.create_line(u_x,0,u_x,self.height, fill="black", width=2)
-
-        # text
-        self.create_text(self.width/2, self.height/2,
-                         text=f"{self.label_text}: {self.current_fill:.0f}%",
-                         fill="white", font=("Arial",10))
-        self.create_text(l_x, -5, text=f"{self.lower_threshold:.0f}%",
-                         fill="black", font=("Arial",8))
-        self.create_text(u_x, -5, text=f"{self.upper_threshold:.0f}%",
-                         fill="black", font=("Arial",8))
+        self._update("lower", l_x, lambda x: (
+            self.coords(self.lower_line, x, 0, x, self.height),
+            self.coords(self.lower_text, x, -5)))
+        self._update("upper", u_x, lambda x: (
+            self.coords(self.upper_line, x, 0, x, self.height),
+            self.coords(self.upper_text, x, -5)))
+        self._update("lower_text", f"{self.lower_threshold:.0f}%",
+                     lambda t: self.itemconfig(self.lower_text, text=t))
+        self._update("upper_text", f"{self.upper_threshold:.0f}%",
+                     lambda t: self.itemconfig(self.upper_text, text=t))
 
         # random line
         if self.random_threshold is not None:
             rx = (self.random_threshold/100)*self.width
-            self.create_line(rx,0,rx,self.height,
-                             fill="lime", width=2, dash=(3,2))
+            self._update("random", rx, lambda x: (
+                self.coords(self.random_line, x, 0, x, self.height),
+                self.itemconfig(self.random_line, state="normal")))
+        else:
+            self._update("random", None,
+                         lambda _: self.itemconfig(self.random_line, state="hidden"))
 
-        # external callback
-        if self.threshold_change_callback:
+        # external callback, only when the thresholds actually moved
+        thresholds = (self.lower_threshold, self.upper_threshold)
+        if self.threshold_change_callback and thresholds != self._notified:
+            self._notified = thresholds
             self.threshold_change_callback(self.lower_threshold,
                                            self.upper_threshold)
 
@@ -390,6 +194,10 @@ class DualThresholdFillSlider(tk.Canvas):
         self.current_fill = max(0, min(100, val))
         self.draw()
 
+    def set_random_threshold(self, val):
+        self.random_threshold = val
+        self.draw()
+
     def on_click(self, e):
         click_val = (e.x / self.width)*100
         d_lower = abs(click_val - self.lower_threshold)
@@ -470,7 +278,6 @@ class ThresholdOverlay:
 # ------------------------------------------------------------------------------
 class AutoPotionApp:
     def __init__(self, root):
-        global CONFIG
         self.root = root
         self.root.title("PoE2 Auto-Potion Bot")
         load_config()
@@ -494,19 +301,37 @@ class AutoPotionApp:
         self.chicken_threshold_var = tk.DoubleVar(value=CONFIG.get("CHICKEN_THRESHOLD", DEFAULT_CHICKEN_THRESHOLD))
         # NEW: Poisoned threshold increase variable
         self.poisoned_threshold_var = tk.DoubleVar(value=CONFIG.get("POISONED_THRESHOLD_INCREASE", DEFAULT_POISONED_THRESHOLD_INCREASE))
+        self.hp_fill_mode_var = tk.StringVar(value=CONFIG.get("HP_FILL_MODE", DEFAULT_FILL_MODE))
+        self.mp_fill_mode_var = tk.StringVar(value=CONFIG.get("MP_FILL_MODE", DEFAULT_FILL_MODE))
+        self.min_tick_rate_var = tk.DoubleVar(value=CONFIG.get("MIN_TICK_RATE", DEFAULT_MIN_TICK_RATE))
+        self.max_tick_rate_var = tk.DoubleVar(value=CONFIG.get("MAX_TICK_RATE", DEFAULT_MAX_TICK_RATE))
+        self.verify_enabled_var = tk.BooleanVar(value=CONFIG.get("POTION_VERIFY_ENABLED", DEFAULT_POTION_VERIFY_ENABLED))
+        self.verify_window_var = tk.DoubleVar(value=CONFIG.get("POTION_VERIFY_WINDOW", DEFAULT_POTION_VERIFY_WINDOW))
+        self.predict_enabled_var = tk.BooleanVar(value=CONFIG.get("PREDICT_ENABLED", DEFAULT_PREDICT_ENABLED))
+        self.detect_process_var = tk.BooleanVar(value=CONFIG.get("DETECT_PROCESS", DEFAULT_DETECT_PROCESS))
+        self.flask_check_var = tk.BooleanVar(value=CONFIG.get("FLASK_CHECK_ENABLED", DEFAULT_FLASK_CHECK_ENABLED))
+        self.flask_min_charge_var = tk.DoubleVar(value=CONFIG.get("FLASK_MIN_CHARGE", DEFAULT_FLASK_MIN_CHARGE))
+        self.hp_geometry_var = tk.StringVar(value=CONFIG.get("HP_GEOMETRY", DEFAULT_GEOMETRY))
+        self.mp_geometry_var = tk.StringVar(value=CONFIG.get("MP_GEOMETRY", DEFAULT_GEOMETRY))
 
-        self.monitoring = False
-        self.paused = False
         self.monitor_thread = None
         self.hotkey_handles = []
-
-        self.current_random_hp_threshold = None
-        self.current_random_mp_threshold = None
-        self.last_random_update = time.time()
+        self.log_sink = LogSink()
+        self.window = get_window_tracker()
 
         self.overlay = ThresholdOverlay()
-
-        main_frame = ttk.Frame(root, padding="5")
+        # A config.json edited on disk, or a setting the engine learned, is
+        # stored on the Tk thread, which owns CONFIG
+        self.engine = MonitorEngine(self.window, create_capture_backend(),
+                                    log=self.log_message, publish=self.publish,
+                                    post_config=lambda config, settings:
+                                        self.publish(config_reload=(config, settings)),
+                                    post_setting=lambda key, value:
+                                        self.publish(stored_setting=(key, value)))
+        self.profiler = self.engine.profiler
+        self.profiler.enabled = CONFIG.get("PROFILE_ENABLED", DEFAULT_PROFILE_ENABLED)
+
+        main_frame = self.main_frame = ttk.Frame(root, padding="5")
         main_frame.pack(fill="both", expand=True)
 
         self.status_label = ttk.Label(main_frame, text="Status: Not Monitoring")
@@ -580,8 +405,83 @@ class AutoPotionApp:
                                    command=self.auto_find_regions)
         btn_auto_find.pack(side="left", expand=True, fill="x", padx=2)
 
-        # Settings frame
-        settings_frame = ttk.LabelFrame(main_frame, text="Settings", padding="5")
+        self.build_settings_panel()
+
+        # Rarely used panels are built the first time they are opened
+        panel_bar = ttk.Frame(main_frame)
+        panel_bar.grid(row=7, column=0, columnspan=3, sticky="ew")
+        ttk.Button(panel_bar, text="Profiler",
+                   command=lambda: self.toggle_panel("profiler")).pack(side="left", padx=2)
+        self.panels = {}
+        self.panel_builders = {
+            "profiler": self.build_profile_panel,
+        }
+        self.profile_enabled_var = tk.BooleanVar(value=self.profiler.enabled)
+        self.profile_label = None
+
+        # Log
+        log_frame = ttk.LabelFrame(main_frame, text="Log")
+        log_frame.grid(row=9, column=0, columnspan=3, pady=3, sticky="nsew")
+        self.log_text = tk.Text(log_frame, height=6, state="disabled")
+        self.log_text.pack(fill="both", expand=True)
+
+        # Start/Stop
+        self.toggle_button = ttk.Button(main_frame, text="Start Monitoring",
+                                        command=self.toggle_monitoring)
+        self.toggle_button.grid(row=10, column=0, columnspan=3, pady=5)
+
+        # Worker -> UI hand-off: latest published values and what is on screen
+        self.ui_state = {}
+        self.ui_applied = {}
+        self.ui_appliers = {
+            "hp_fill": self.hp_slider.set_fill,
+            "mp_fill": self.mp_slider.set_fill,
+            "hp_random": self.hp_slider.set_random_threshold,
+            "mp_random": self.mp_slider.set_random_threshold,
+            "status": lambda text: self.status_label.config(text=text),
+            "overlay": lambda lines: self.overlay.update_lines(*lines),
+            "config_reload": lambda reloaded: self.apply_reloaded_config(*reloaded),
+            "stored_setting": lambda item: self.engine.store_setting(*item),
+        }
+        self.root.after(UI_REFRESH_INTERVAL_MS, self.refresh_ui)
+        self.root.after(PROFILE_REFRESH_MS, self.refresh_profile)
+
+        # Everything below can wait until the window has been drawn
+        self.toggle_button.state(["disabled"])
+        self.root.after_idle(self.warm_up)
+
+    def warm_up(self):
+        """
+        Runs once the window is up: load numpy/cv2/PIL/pyautogui, decode
+        the templates and the flask mask, build the color table and register hotkeys, then
+        enable Start. LazyLoader is not thread-safe before Python 3.12, so
+        the first use of the lazy modules happens here, on the Tk thread,
+        before the monitor thread can exist.
+        """
+        finish_imports(np, cv2, Image, pyautogui)
+        get_template_store().preload()
+        flask_interior()
+        get_color_classifier()
+        if self.profiler.enabled:
+            self.toggle_panel("profiler")
+        self.update_hotkeys()
+        self.toggle_button.state(["!disabled"])
+
+    # -------------------------
+    # On-demand panels
+    # -------------------------
+    def toggle_panel(self, name):
+        """Show or hide a panel, building it the first time it is opened."""
+        panel = self.panels.get(name)
+        if panel is None:
+            self.panels[name] = self.panel_builders[name]()
+        elif panel.winfo_ismapped():
+            panel.grid_remove()
+        else:
+            panel.grid()
+
+    def build_settings_panel(self):
+        settings_frame = ttk.LabelFrame(self.main_frame, text="Settings", padding="5")
         settings_frame.grid(row=6, column=0, columnspan=3, sticky="ew")
 
         # HP
@@ -654,23 +554,119 @@ class AutoPotionApp:
         ttk.Label(settings_frame, text="Poisoned Threshold Increase (%):").grid(row=7, column=0)
         ttk.Entry(settings_frame, textvariable=self.poisoned_threshold_var, width=5).grid(row=7, column=1)
 
+        # Fill estimator per region
+        ttk.Label(settings_frame, text="HP Mode:").grid(row=8, column=0)
+        ttk.Combobox(settings_frame, textvariable=self.hp_fill_mode_var, values=FILL_MODES,
+                     state="readonly", width=6).grid(row=8, column=1)
+        ttk.Label(settings_frame, text="MP Mode:").grid(row=8, column=2)
+        ttk.Combobox(settings_frame, textvariable=self.mp_fill_mode_var, values=FILL_MODES,
+                     state="readonly", width=6).grid(row=8, column=3)
+
+        # Region shape per region
+        ttk.Label(settings_frame, text="HP Shape:").grid(row=9, column=0)
+        ttk.Combobox(settings_frame, textvariable=self.hp_geometry_var, values=GEOMETRIES,
+                     state="readonly", width=6).grid(row=9, column=1)
+        ttk.Label(settings_frame, text="MP Shape:").grid(row=9, column=2)
+        ttk.Combobox(settings_frame, textvariable=self.mp_geometry_var, values=GEOMETRIES,
+                     state="readonly", width=6).grid(row=9, column=3)
+
+        # Tick rate bounds
+        ttk.Label(settings_frame, text="Min Rate (Hz):").grid(row=10, column=0)
+        ttk.Entry(settings_frame, textvariable=self.min_tick_rate_var, width=5).grid(row=10, column=1)
+        ttk.Label(settings_frame, text="Max Rate (Hz):").grid(row=10, column=2)
+        ttk.Entry(settings_frame, textvariable=self.max_tick_rate_var, width=5).grid(row=10, column=3)
+
+        # Potion verification
+        ttk.Label(settings_frame, text="Verify Window (s):").grid(row=11, column=0)
+        ttk.Entry(settings_frame, textvariable=self.verify_window_var, width=5).grid(row=11, column=1)
+        chk_verify = ttk.Checkbutton(settings_frame, text="Verify Potions",
+                                     variable=self.verify_enabled_var)
+        chk_verify.grid(row=11, column=2, columnspan=2, sticky="w")
+
+        # HP trend prediction
+        chk_predict = ttk.Checkbutton(settings_frame, text="Predict HP Trend",
+                                      variable=self.predict_enabled_var)
+        chk_predict.grid(row=12, column=0, columnspan=2, sticky="w")
+        # Capture/detection in a child process (takes effect on next start)
+        chk_detect_process = ttk.Checkbutton(settings_frame, text="Detect in Separate Process",
+                                             variable=self.detect_process_var)
+        chk_detect_process.grid(row=12, column=2, columnspan=2, sticky="w")
+
+        # Flask charges (slots read from the same frame as HP/MP)
+        ttk.Label(settings_frame, text="Flask Min Charge (%):").grid(row=13, column=0)
+        ttk.Entry(settings_frame, textvariable=self.flask_min_charge_var, width=5).grid(row=13, column=1)
+        chk_flask = ttk.Checkbutton(settings_frame, text="Skip Empty Flasks",
+                                    variable=self.flask_check_var)
+        chk_flask.grid(row=13, column=2, columnspan=2, sticky="w")
+        ttk.Button(settings_frame, text="Select HP Flask",
+                   command=lambda: self.select_region("HP Flask")).grid(row=14, column=0, columnspan=2, sticky="ew", padx=2)
+        ttk.Button(settings_frame, text="Select MP Flask",
+                   command=lambda: self.select_region("MP Flask")).grid(row=14, column=2, columnspan=2, sticky="ew", padx=2)
+
         # Save
         btn_save = ttk.Button(settings_frame, text="Save All Settings",
                               command=self.save_all_settings)
-        btn_save.grid(row=8, column=0, columnspan=4, pady=5)
+        btn_save.grid(row=15, column=0, columnspan=4, pady=5)
+        return settings_frame
+
+    def build_profile_panel(self):
+        profile_frame = ttk.LabelFrame(self.main_frame, text="Profiler", padding="5")
+        profile_frame.grid(row=8, column=0, columnspan=3, pady=3, sticky="ew")
+        ttk.Checkbutton(profile_frame, text="Profile Hot Path", variable=self.profile_enabled_var,
+                        command=self.toggle_profiling).grid(row=0, column=0, sticky="w")
+        ttk.Button(profile_frame, text="Reset",
+                   command=self.profiler.reset).grid(row=0, column=1, padx=2)
+        ttk.Button(profile_frame, text="Export...",
+                   command=self.export_profile).grid(row=0, column=2, padx=2)
+        self.profile_label = ttk.Label(profile_frame, text="", font=("Courier", 8), justify="left")
+        self.profile_label.grid(row=1, column=0, columnspan=3, sticky="w")
+        return profile_frame
 
-        # Log
-        log_frame = ttk.LabelFrame(main_frame, text="Log")
-        log_frame.grid(row=9, column=0, columnspan=3, pady=3, sticky="nsew")
-        self.log_text = tk.Text(log_frame, height=6, state="disabled")
-        self.log_text.pack(fill="both", expand=True)
-
-        # Start/Stop
-        self.toggle_button = ttk.Button(main_frame, text="Start Monitoring",
-                                        command=self.toggle_monitoring)
-        self.toggle_button.grid(row=10, column=0, columnspan=3, pady=5)
+    # -------------------------
+    # Coalesced UI updates
+    # -------------------------
+    def publish(self, **state):
+        """Record the latest UI state from any thread; refresh_ui() applies it."""
+        self.ui_state.update(state)
+
+    def refresh_ui(self):
+        """Apply published state that changed since the last frame (Tk thread only)."""
+        for key, value in list(self.ui_state.items()):
+            if key in self.ui_applied and self.ui_applied[key] == value:
+                continue
+            self.ui_applied[key] = value
+            self.ui_appliers[key](value)
+        self.flush_log()
+        self.root.after(UI_REFRESH_INTERVAL_MS, self.refresh_ui)
 
-        self.update_hotkeys()
+    # -------------------------
+    # Profiler
+    # -------------------------
+    def toggle_profiling(self):
+        self.profiler.enabled = self.profile_enabled_var.get()
+        CONFIG["PROFILE_ENABLED"] = self.profiler.enabled
+        if not self.profiler.enabled:
+            self.profile_label.config(text="")
+
+    def refresh_profile(self):
+        """Redraw the stage table about once a second while profiling."""
+        if self.profiler.enabled and self.profile_label is not None and self.profile_label.winfo_ismapped():
+            self.profile_label.config(text=self.profiler.summary())
+        self.root.after(PROFILE_REFRESH_MS, self.refresh_profile)
+
+    def export_profile(self):
+        path = filedialog.asksaveasfilename(
+            defaultextension=".csv",
+            filetypes=[("CSV", "*.csv"), ("JSON", "*.json")],
+            initialfile="autopot_profile.csv",
+        )
+        if not path:
+            return
+        try:
+            self.profiler.export(path)
+            self.log_message(f"Profile exported to {path}")
+        except OSError as e:
+            messagebox.showerror("Error", f"Could not export profile: {e}")
 
     # -------------------------
     # Threshold slider callbacks
@@ -679,11 +675,19 @@ class AutoPotionApp:
         if hasattr(self, "hp_lower_var") and hasattr(self, "hp_upper_var"):
             self.hp_lower_var.set(lower)
             self.hp_upper_var.set(upper)
+        self.apply_thresholds("HP", lower, upper)
 
     def update_mp_threshold_entries(self, lower, upper):
         if hasattr(self, "mp_lower_var") and hasattr(self, "mp_upper_var"):
             self.mp_lower_var.set(lower)
             self.mp_upper_var.set(upper)
+        self.apply_thresholds("MP", lower, upper)
+
+    def apply_thresholds(self, bar, lower, upper):
+        """Slider edits take effect at once (the engine reads the compiled snapshot); Save persists them."""
+        CONFIG[f"THRESHOLD_{bar}_LOWER"] = lower
+        CONFIG[f"THRESHOLD_{bar}_UPPER"] = upper
+        compile_config()
 
     def update_hp_slider_from_entry(self, event):
         try:
@@ -692,6 +696,7 @@ class AutoPotionApp:
             self.hp_slider.lower_threshold = l
             self.hp_slider.upper_threshold = h
             self.hp_slider.draw()
+            self.apply_thresholds("HP", l, h)
         except:
             pass
 
@@ -702,6 +707,7 @@ class AutoPotionApp:
             self.mp_slider.lower_threshold = l
             self.mp_slider.upper_threshold = h
             self.mp_slider.draw()
+            self.apply_thresholds("MP", l, h)
         except:
             pass
 
@@ -743,6 +749,7 @@ class AutoPotionApp:
                 sel = lb.get(lb.curselection())
                 CONFIG["TARGET_WINDOW_TITLE"] = sel
                 save_config()
+                self.window.invalidate()
                 self.target_window_label.config(text=f"Target Window: {sel}")
                 sel_win.destroy()
             except:
@@ -812,6 +819,9 @@ class AutoPotionApp:
             if which=="HP":
                 CONFIG["HP_REGION"] = [rx, ry, rw, rh]
                 self.hp_region_label.config(text=f"HP Region: {CONFIG['HP_REGION']}")
+            elif which.endswith("Flask"):
+                key = "1" if which.startswith("HP") else "2"
+                CONFIG.setdefault("FLASK_REGIONS", {})[key] = [rx, ry, rw, rh]
             else:
                 CONFIG["MP_REGION"] = [rx, ry, rw, rh]
                 self.mp_region_label.config(text=f"MP Region: {CONFIG['MP_REGION']}")
@@ -828,48 +838,45 @@ class AutoPotionApp:
         if not target_title:
             messagebox.showwarning("Error", "Please select a target window first!")
             return
-        hwnd = win32gui.FindWindow(None, target_title)
-        if hwnd == 0:
+        self.window.invalidate()
+        rect = self.window.get_rect()
+        if rect is None:
             messagebox.showerror("Error", "Target window not found.")
             return
 
-        rect = win32gui.GetWindowRect(hwnd)
-        x, y, w, h = rect[0], rect[1], rect[2]-rect[0], rect[3]-rect[1]
+        x, y, w, h = rect
         screenshot = pyautogui.screenshot(region=(x, y, w, h))
         screenshot_cv = cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
 
         # Expect user to provide health.png / mana.png in same directory
-        hp_template_path = os.path.join(SCRIPT_DIR, "health.png")
-        mp_template_path = os.path.join(SCRIPT_DIR, "mana.png")
-        if not os.path.exists(hp_template_path) or not os.path.exists(mp_template_path):
+        store = get_template_store()
+        try:
+            hp_entry = store.get(*HP_TEMPLATE)
+            mp_entry = store.get(*MP_TEMPLATE)
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        if hp_entry is None or mp_entry is None:
             messagebox.showerror("Error", "Template images for HP (health.png) and MP (mana.png) not found!")
             return
 
-        hp_template = cv2.imread(hp_template_path, cv2.IMREAD_COLOR)
-        mp_template = cv2.imread(mp_template_path, cv2.IMREAD_COLOR)
-        hp_refined = refine_template_crop(hp_template, target_color="red")
-        mp_refined = refine_template_crop(mp_template, target_color="blue")
-
-        hp_cropped = crop_by_max_color_column(hp_refined, target_color="red", slice_width=4, crop_percent=0.05)
-        mp_cropped = crop_by_max_color_column(mp_refined, target_color="blue", slice_width=4, crop_percent=0.05)
-
-        res_hp = cv2.matchTemplate(screenshot_cv, hp_cropped, cv2.TM_CCOEFF_NORMED)
-        _, max_val_hp, _, max_loc_hp = cv2.minMaxLoc(res_hp)
-
-        res_mp = cv2.matchTemplate(screenshot_cv, mp_cropped, cv2.TM_CCOEFF_NORMED)
-        _, max_val_mp, _, max_loc_mp = cv2.minMaxLoc(res_mp)
-
-        threshold = 0.8
-        if max_val_hp < threshold or max_val_mp < threshold:
+        start = time.perf_counter()
+        hp_match, mp_match = find_hp_mp_templates(screenshot_cv, hp_entry.variants, mp_entry.variants)
+        total = time.perf_counter() - start
+        for label, match in (("HP", hp_match), ("MP", mp_match)):
+            where = "corner" if match.in_roi else "full window"
+            scale = f"{match.scale:.2f}" if match.scale is not None else "-"
+            self.log_message(f"Auto-find {label}: score {match.score:.2f}, scale {scale}, "
+                             f"{where}, {match.seconds * 1000:.0f} ms")
+        self.log_message(f"Auto-find total: {total * 1000:.0f} ms ({w}x{h})")
+
+        if hp_match.score < AUTO_FIND_THRESHOLD or mp_match.score < AUTO_FIND_THRESHOLD:
             messagebox.showerror("Error", "Could not detect health/mana regions automatically.")
             return
 
-        hp_h, hp_w = hp_cropped.shape[:2]
-        mp_h, mp_w = mp_cropped.shape[:2]
-
         # Convert the found location in screenshot to absolute screen coords
-        hp_region = [x + max_loc_hp[0], y + max_loc_hp[1], hp_w, hp_h]
-        mp_region = [x + max_loc_mp[0], y + max_loc_mp[1], mp_w, mp_h]
+        hp_region = [x + hp_match.loc[0], y + hp_match.loc[1], *hp_match.size]
+        mp_region = [x + mp_match.loc[0], y + mp_match.loc[1], *mp_match.size]
 
         # Show popup so user sees the guess
         show_auto_found_popup(screenshot_cv, hp_region, mp_region)
@@ -903,8 +910,22 @@ class AutoPotionApp:
         CONFIG["CHICKEN_THRESHOLD"] = self.chicken_threshold_var.get()
         # Save the new poisoned threshold increase setting
         CONFIG["POISONED_THRESHOLD_INCREASE"] = self.poisoned_threshold_var.get()
+        CONFIG["HP_FILL_MODE"] = self.hp_fill_mode_var.get()
+        CONFIG["MP_FILL_MODE"] = self.mp_fill_mode_var.get()
+        CONFIG["HP_GEOMETRY"] = self.hp_geometry_var.get()
+        CONFIG["MP_GEOMETRY"] = self.mp_geometry_var.get()
+        CONFIG["MIN_TICK_RATE"] = self.min_tick_rate_var.get()
+        CONFIG["MAX_TICK_RATE"] = self.max_tick_rate_var.get()
+        CONFIG["POTION_VERIFY_ENABLED"] = self.verify_enabled_var.get()
+        CONFIG["POTION_VERIFY_WINDOW"] = self.verify_window_var.get()
+        CONFIG["PROFILE_ENABLED"] = self.profile_enabled_var.get()
+        CONFIG["PREDICT_ENABLED"] = self.predict_enabled_var.get()
+        CONFIG["DETECT_PROCESS"] = self.detect_process_var.get()
+        CONFIG["FLASK_CHECK_ENABLED"] = self.flask_check_var.get()
+        CONFIG["FLASK_MIN_CHARGE"] = self.flask_min_charge_var.get()
 
         save_config()
+        self.engine.apply_settings()
 
         # update sliders
         self.hp_slider.lower_threshold = CONFIG["THRESHOLD_HP_LOWER"]
@@ -917,12 +938,76 @@ class AutoPotionApp:
         self.update_hotkeys()
         messagebox.showinfo("Settings","All settings saved.")
 
+    def apply_reloaded_config(self, config, settings):
+        """Install a config.json edited on disk and show it in the widgets (Tk thread only)."""
+        self.engine.install_reloaded_config(config, settings)
+        self.refresh_settings_widgets()
+
+    def refresh_settings_widgets(self):
+        """Mirror of save_all_settings(): load every widget from CONFIG so Save keeps the new values."""
+        self.hp_lower_var.set(CONFIG["THRESHOLD_HP_LOWER"])
+        self.hp_upper_var.set(CONFIG["THRESHOLD_HP_UPPER"])
+        self.mp_lower_var.set(CONFIG["THRESHOLD_MP_LOWER"])
+        self.mp_upper_var.set(CONFIG["THRESHOLD_MP_UPPER"])
+        self.color_tighten_var.set(CONFIG["COLOR_TIGHTENING"])
+        self.health_pot_delay_var.set(CONFIG["HEALTH_POTION_DELAY"])
+        self.mana_pot_delay_var.set(CONFIG["MANA_POTION_DELAY"])
+        self.toggle_key_var.set(CONFIG["TOGGLE_KEY"])
+        self.pause_key_var.set(CONFIG["PAUSE_KEY"])
+        self.single_screen_var.set(CONFIG["SINGLE_SCREEN_HOTKEY"])
+        self.use_gray_var.set(CONFIG["USE_GRAY_AS_EMPTY"])
+        self.show_overlay_var.set(CONFIG["SHOW_THRESHOLD_OVERLAY"])
+        self.chicken_enabled_var.set(CONFIG["CHICKEN_ENABLED"])
+        self.chicken_threshold_var.set(CONFIG["CHICKEN_THRESHOLD"])
+        self.poisoned_threshold_var.set(CONFIG["POISONED_THRESHOLD_INCREASE"])
+        self.hp_fill_mode_var.set(CONFIG["HP_FILL_MODE"])
+        self.mp_fill_mode_var.set(CONFIG["MP_FILL_MODE"])
+        self.hp_geometry_var.set(CONFIG["HP_GEOMETRY"])
+        self.mp_geometry_var.set(CONFIG["MP_GEOMETRY"])
+        self.min_tick_rate_var.set(CONFIG["MIN_TICK_RATE"])
+        self.max_tick_rate_var.set(CONFIG["MAX_TICK_RATE"])
+        self.verify_enabled_var.set(CONFIG["POTION_VERIFY_ENABLED"])
+        self.verify_window_var.set(CONFIG["POTION_VERIFY_WINDOW"])
+        self.profile_enabled_var.set(CONFIG["PROFILE_ENABLED"])
+        self.predict_enabled_var.set(CONFIG["PREDICT_ENABLED"])
+        self.detect_process_var.set(CONFIG["DETECT_PROCESS"])
+        self.flask_check_var.set(CONFIG["FLASK_CHECK_ENABLED"])
+        self.flask_min_charge_var.set(CONFIG["FLASK_MIN_CHARGE"])
+        self.profiler.enabled = CONFIG["PROFILE_ENABLED"]
+
+        self.target_window_label.config(text=f"Target Window: {CONFIG.get('TARGET_WINDOW_TITLE')}")
+        self.hp_region_label.config(text=f"HP Region: {CONFIG.get('HP_REGION') or 'Not set'}")
+        self.mp_region_label.config(text=f"MP Region: {CONFIG.get('MP_REGION') or 'Not set'}")
+
+        self.hp_slider.label_text = "HP Empty" if CONFIG["USE_GRAY_AS_EMPTY"] else "HP"
+        self.hp_slider.lower_threshold = CONFIG["THRESHOLD_HP_LOWER"]
+        self.hp_slider.upper_threshold = CONFIG["THRESHOLD_HP_UPPER"]
+        self.mp_slider.lower_threshold = CONFIG["THRESHOLD_MP_LOWER"]
+        self.mp_slider.upper_threshold = CONFIG["THRESHOLD_MP_UPPER"]
+        self.hp_slider.draw()
+        self.mp_slider.draw()
+
+        if CONFIG["SHOW_THRESHOLD_OVERLAY"]:
+            self.overlay.show()
+        else:
+            self.overlay.hide()
+        self.update_hotkeys()
+
     def log_message(self, msg):
+        """Safe from any thread; never touches the widget or the disk directly."""
+        self.log_sink.log(msg)
+
+    def flush_log(self):
+        """Append buffered lines to the Log widget in one insert (Tk thread only)."""
+        lines = self.log_sink.drain()
+        if not lines:
+            return
         self.log_text.config(state="normal")
-        self.log_text.insert("end", msg+"\n")
+        self.log_text.insert("end", "\n".join(lines) + "\n")
+        # keep only the last LOG_MAX_LINES lines
+        self.log_text.delete("1.0", f"end-{LOG_MAX_LINES + 1}l")
         self.log_text.see("end")
         self.log_text.config(state="disabled")
-        print(msg)
 
     # -------------------------
     # Hotkeys
@@ -947,21 +1032,20 @@ class AutoPotionApp:
         self.root.after(0, self.toggle_monitoring)
 
     def hotkey_pause(self):
-        self.paused = not self.paused
-        if self.paused:
+        self.engine.set_paused(not self.engine.paused)
+        if self.engine.paused:
             self.log_message("Paused via hotkey.")
-            self.status_label.config(text="Status: Paused (Hotkey)")
+            self.publish(status="Status: Paused (Hotkey)")
         else:
             self.log_message("Resumed via hotkey.")
-            self.status_label.config(text="Status: Monitoring")
+            self.publish(status="Status: Monitoring")
 
     def show_gui_hotkey(self):
         self.overlay.hide()
         # bring game window front
-        hwnd = win32gui.FindWindow(None, CONFIG.get("TARGET_WINDOW_TITLE","Path of Exile 2"))
-        if hwnd != 0:
+        if self.window.find():
             try:
-                win32gui.SetForegroundWindow(hwnd)
+                self.window.bring_to_front()
                 time.sleep(0.2)
             except:
                 pass
@@ -979,188 +1063,33 @@ class AutoPotionApp:
     # Monitoring
     # -------------------------
     def toggle_monitoring(self):
-        self.monitoring = not self.monitoring
-        if self.monitoring:
+        if not self.engine.monitoring:
             self.toggle_button.config(text="Stop Monitoring")
             self.log_message("Monitoring started.")
-            self.monitor_thread = threading.Thread(target=self.monitor_loop, daemon=True)
+            if self.monitor_thread is not None:
+                # A quick stop -> start: let the previous run finish tearing down first
+                self.monitor_thread.join()
+            self.engine.start()
+            self.monitor_thread = threading.Thread(target=self.engine.run, daemon=True)
             self.monitor_thread.start()
         else:
+            self.engine.stop()
             self.toggle_button.config(text="Start Monitoring")
-            self.log_message("Monitoring stopped.")
-
-    def monitor_loop(self):
-        """
-        Runs in a thread while self.monitoring = True.
-        We do NOT break out entirely on chicken; instead we:
-         1) Run the chicken flow,
-         2) Wait for HP >= 50%,
-         3) Resume normal potion usage,
-         4) Keep monitoring forever.
-        """
-        while self.monitoring:
-            if self.paused:
-                self.status_label.config(text="Status: Paused")
-                time.sleep(MONITOR_SLEEP_TIME)
-                continue
-
-            # must be in active window
-            hwnd_target = win32gui.FindWindow(None, CONFIG.get("TARGET_WINDOW_TITLE","Path of Exile 2"))
-            hwnd_active = win32gui.GetForegroundWindow()
-            if hwnd_target==0:
-                self.status_label.config(text="Status: Game Window Not Found")
-                time.sleep(MONITOR_SLEEP_TIME)
-                continue
-            if hwnd_target!=hwnd_active:
-                self.status_label.config(text="Status: Target Window Not Active")
-                time.sleep(MONITOR_SLEEP_TIME)
-                continue
-
-            # get HP/MP
-            hp_fill = get_health_fill_percentage(CONFIG["HP_REGION"])
-            mp_fill = get_mana_fill_percentage(CONFIG["MP_REGION"])
-
-            self.root.after(0, self.hp_slider.set_fill, hp_fill)
-            self.root.after(0, self.mp_slider.set_fill, mp_fill)
-
-            # if both basically 0 => might be loading
-            if hp_fill<1 and mp_fill<1:
-                self.status_label.config(text="Status: Pause/Loading/Unknown")
-                time.sleep(MONITOR_SLEEP_TIME)
-                continue
-
-            self.status_label.config(text="Status: Monitoring")
-
-            # -- Chickening check --
-            if CONFIG.get("CHICKEN_ENABLED",False):
-                c_thr = CONFIG.get("CHICKEN_THRESHOLD", 30)
-                if hp_fill < c_thr:
-                    self.log_message(f"HP < {c_thr} => chickening out!")
-                    # CHANGED: do not break or stop monitoring
-                    self.chicken_and_reconnect()
-                    self.log_message("Waiting until HP >= 50% before using potions.")
-                    # Wait for HP >= 50 but still keep monitoring loop alive
-                    while True:
-                        if not self.monitoring:
-                            return
-                        hp_fill = get_health_fill_percentage(CONFIG["HP_REGION"])
-                        mp_fill = get_mana_fill_percentage(CONFIG["MP_REGION"])
-                        self.root.after(0, self.hp_slider.set_fill, hp_fill)
-                        self.root.after(0, self.mp_slider.set_fill, mp_fill)
-                        if hp_fill >= 50:
-                            self.log_message("HP >= 50, resuming normal potion usage.")
-                            break
-                        time.sleep(1.0)
-
-            # random thresholds
-            now = time.time()
-            if now - self.last_random_update >= 0.5:
-                hp_l = self.hp_slider.lower_threshold
-                hp_u = self.hp_slider.upper_threshold
-                mp_l = self.mp_slider.lower_threshold
-                mp_u = self.mp_slider.upper_threshold
-                self.current_random_hp_threshold = random.uniform(hp_l, hp_u)
-                self.current_random_mp_threshold = random.uniform(mp_l, mp_u)
-                self.last_random_update = now
-
-                self.hp_slider.random_threshold = self.current_random_hp_threshold
-                self.mp_slider.random_threshold = self.current_random_mp_threshold
-                self.root.after(0, self.hp_slider.draw)
-                self.root.after(0, self.mp_slider.draw)
-
-                if CONFIG.get("SHOW_THRESHOLD_OVERLAY",False):
-                    self.root.after(0, self.overlay.update_lines,
-                                    self.current_random_hp_threshold,
-                                    self.current_random_mp_threshold)
-
-            # Adjust HP lower threshold if poisoned (green health)
-            hp_lower = self.hp_slider.lower_threshold
-            if CONFIG.get("IS_POISONED", False):
-                increase = CONFIG.get("POISONED_THRESHOLD_INCREASE", 0)
-                hp_lower = hp_lower * (1 + increase/100)
-
-            # potions
-            hp_delay = CONFIG.get("HEALTH_POTION_DELAY",0.5)
-            if (hp_fill < hp_lower) or (hp_fill < self.current_random_hp_threshold):
-                self.use_potion("1", hp_fill, "Health", hp_delay)
-
-            mp_lower = self.mp_slider.lower_threshold
-            mp_delay = CONFIG.get("MANA_POTION_DELAY",0.5)
-            if (mp_fill < mp_lower) or (mp_fill < self.current_random_mp_threshold):
-                self.use_potion("2", mp_fill, "Mana", mp_delay)
-
-            time.sleep(MONITOR_SLEEP_TIME)
-
-        print("Exited monitor loop.")
-
-    def use_potion(self, key, fill_val, label, delay):
-        pyautogui.press(key)
-        self.log_message(f"{label} potion used! (fill={fill_val:.1f}%)")
-        time.sleep(delay)
-
-    # ---------------
-    # Chicken flow
-    # ---------------
-    def chicken_and_reconnect(self):
-        self.log_message("Chickening flow: pressing ESC, searching for exit button.")
-        hwnd = win32gui.FindWindow(None, CONFIG.get("TARGET_WINDOW_TITLE", "Path of Exile 2"))
-        if hwnd:
-            try:
-                win32gui.SetForegroundWindow(hwnd)
-            except Exception as e:
-                self.log_message(f"Error setting foreground: {e}")
-
-        pyautogui.press("esc")
-        # Reduced delay to 0.1 seconds; adjust as needed based on UI response time
-        time.sleep(0.1)
-
-        exit_path = os.path.join(SCRIPT_DIR, "exit_to_log_in_screen.png")
-        if not os.path.exists(exit_path):
-            self.log_message("ERROR: exit_to_log_in_screen.png not found!")
-        else:
-            # Use the game window's region to narrow the search area
-            game_rect = get_game_window_rect()
-            if game_rect:
-                x, y, w, h = game_rect
-                btn = pyautogui.locateOnScreen(exit_path, confidence=0.8, region=(x, y, w, h), grayscale=True)
-            else:
-                btn = pyautogui.locateOnScreen(exit_path, confidence=0.8, grayscale=True)
-
-            if btn:
-                self.log_message("Exit button found. Clicking center...")
-                center_x, center_y = pyautogui.center(btn)
-                pyautogui.moveTo(center_x, center_y)
-                pyautogui.click()
-                self.log_message("Clicked 'Exit to Log In Screen'.")
-            else:
-                self.log_message("Could NOT find 'Exit to Log In Screen' on screen!")
-
-        time.sleep(2.0)
-
-        self.log_message("Waiting for HP or MP to reappear (load screen) ...")
-        while True:
-            if not self.monitoring:
-                return
-            hwnd = win32gui.FindWindow(None, CONFIG.get("TARGET_WINDOW_TITLE", "Path of Exile 2"))
-            if hwnd:
-                try:
-                    win32gui.SetForegroundWindow(hwnd)
-                except Exception as e:
-                    self.log_message(f"Error setting foreground: {e}")
-            hp = get_health_fill_percentage(CONFIG["HP_REGION"])
-            mp = get_mana_fill_percentage(CONFIG["MP_REGION"])
-            self.root.after(0, self.hp_slider.set_fill, hp)
-            self.root.after(0, self.mp_slider.set_fill, mp)
-            if hp > 1 or mp > 1:
-                self.log_message("HP/MP found (loading complete).")
-                break
-            time.sleep(1.0)
+            self.log_message("Monitoring stopped. "
+                             f"Unchanged regions skipped: {self.engine.fill_cache.skip_rate():.0%}")
+            if self.engine.skipped_presses:
+                self.log_message(f"Skipped {self.engine.skipped_presses} presses on empty flasks.")
+            if self.engine.early_presses:
+                self.log_message(f"Trend prediction fired {self.engine.early_presses} potions early, "
+                                 f"lead {self.engine.lead_times.summary()}.")
 
 
 def main():
     root = tk.Tk()
     app = AutoPotionApp(root)
     root.mainloop()
+    app.log_sink.close()
 
 if __name__=="__main__":
+    multiprocessing.freeze_support()  # detector process in frozen builds
     main()
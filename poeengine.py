@@ -0,0 +1,2709 @@
+"""
+Headless monitor engine: capture, detection, decisions and the asyncio
+runtime, with no Tk. poeautopot.py is the GUI on top of it.
+
+    python poeengine.py [--config PATH] [--capture gdi|screen|replay]
+                        [--replay PATH] [--dry-run] [--seconds S] [--profile PATH]
+
+runs the monitor from the saved config.json (regions, thresholds, delays,
+chicken settings) until Ctrl+C. Platform access goes through three small
+interfaces, so the engine also runs on Linux with stand-in backends:
+
+- window: find(), is_focused(), get_rect(), bring_to_front()
+  (WindowTracker on Windows, FakeWindowTracker elsewhere)
+- capture: grab(regions) -> Frame or None, close()
+  (GdiCapture, ScreenCapture, ReplayCapture)
+- input: press(key), click(x, y)
+  (PyAutoGuiInput, or DryRunInput which only logs)
+"""
+import argparse
+import asyncio
+import importlib.util
+import threading
+import queue
+import time
+import json
+import csv
+import zlib
+import os
+import multiprocessing
+from multiprocessing import shared_memory
+try:
+    import win32gui
+    import win32ui
+    import win32con
+except ImportError:  # non-Windows: only the replay capture backend is usable
+    win32gui = win32ui = win32con = None
+import random
+import sys
+import logging
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque, namedtuple
+
+
+def lazy_import(name):
+    """
+    Return module `name` without executing it yet: the real import runs on
+    first attribute access. Returns None if the module is not installed.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        return None
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+def finish_imports(*modules):
+    """Run the deferred import of each lazy_import() module now (None is skipped)."""
+    for module in modules:
+        if module is not None:
+            getattr(module, "__file__", None)  # any attribute access loads it
+
+
+# Heavy imports wait until a frame is actually captured or matched, so the
+# GUI window (and the headless engine) come up without paying for them
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+# None when not installed; replay capture and benchmarks work without it
+pyautogui = lazy_import("pyautogui")
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+CONFIG_FILE = os.path.join(SCRIPT_DIR, "config.json")
+LOG_FILE = os.path.join(SCRIPT_DIR, "autopot.log")
+
+# Default thresholds
+DEFAULT_THRESHOLD_HP_LOWER = 55
+DEFAULT_THRESHOLD_HP_UPPER = 65
+DEFAULT_THRESHOLD_MP_LOWER = 55
+DEFAULT_THRESHOLD_MP_UPPER = 65
+
+# Default color/potion/delay
+DEFAULT_COLOR_TIGHTENING = 0
+DEFAULT_HEALTH_POTION_DELAY = 0.5
+DEFAULT_MANA_POTION_DELAY = 0.5
+
+# Default keys
+DEFAULT_TOGGLE_KEY = "F8"
+DEFAULT_PAUSE_KEY = "F9"
+DEFAULT_SINGLE_SCREEN_HOTKEY = "F10"
+
+# Default region not set
+CONFIG = {}
+# Session-only settings laid over CONFIG (command line overrides); never saved
+CONFIG_OVERRIDES = {}
+
+# Window tracking: how long cached window handle/rect (and, without change
+# events, focus) may be served before they are looked up again
+WINDOW_REFRESH_INTERVAL = 2.0
+FOCUS_POLL_INTERVAL = 0.25
+
+# How often the monitor loop checks config.json on disk for edits to hot reload
+CONFIG_RELOAD_INTERVAL = 1.0
+
+# Auto-find template search: grayscale match on a downscaled frame, then
+# full-resolution colour refinement around the best few candidates, tried at
+# several UI scales. The expected screen corner (x, y, w, h as fractions of
+# the window) is searched first; the whole window only on a miss.
+AUTO_FIND_THRESHOLD = 0.8
+PYRAMID_SCALE = 0.5
+PYRAMID_CANDIDATES = 3
+UI_SCALES = (1.0, 0.75, 1.25, 1.5)
+HP_SEARCH_ROI = (0.0, 0.5, 0.35, 0.5)   # bottom-left
+MP_SEARCH_ROI = (0.65, 0.5, 0.35, 0.5)  # bottom-right
+MONITOR_SLEEP_TIME = 0.2  # normal tick interval; the scheduler adapts around it
+
+# Adaptive tick scheduler defaults
+DEFAULT_MIN_TICK_RATE = 2    # Hz, floor when paused/unfocused/loading
+DEFAULT_MAX_TICK_RATE = 30   # Hz, ceiling when HP is dropping or near a threshold
+FAST_DROP_RATE = 25          # HP%/s fall that counts as heavy damage
+NEAR_THRESHOLD_MARGIN = 10   # HP% above a trigger that counts as "near"
+
+# Logging: lines waiting for the next UI flush are held in a ring buffer of
+# LOG_BUFFER_SIZE
+LOG_BUFFER_SIZE = 1000
+LOG_FILE_MAX_BYTES = 1_000_000
+LOG_FILE_BACKUPS = 3
+
+# Potion verification: after a press, the fill must start rising within the
+# window or the press is treated as dropped and retried
+DEFAULT_POTION_VERIFY_ENABLED = True
+DEFAULT_POTION_VERIFY_WINDOW = 0.5  # seconds
+VERIFY_MIN_RISE = 1.0      # fill% above the post-press low that counts as an effect
+RECOVERY_STALL_TIME = 0.6  # seconds without rising that ends a recovery
+RECOVERY_MAX_TIME = 5.0    # hard cap on how long a recovery suppresses presses
+VERIFY_LATENCY_SAMPLES = 100
+
+# HP trend prediction: act on where HP will be when the flask can take effect
+DEFAULT_PREDICT_ENABLED = False
+TREND_SAMPLES = 8          # ring buffer of (time, fill) samples
+TREND_WINDOW = 0.6         # seconds of history the slope is fitted over
+PREDICT_LATENCY = 0.15     # seconds from decision to flask effect (input + game)
+PREDICT_FLASK_RESERVE = 30  # % of flask charge above the minimum a press on the trend alone must leave
+CHICKEN_LEAD_TIME = 0.3    # chicken when projected time-to-zero is shorter than this
+TREND_FALLING_SAMPLES = 3  # a trend chicken needs HP to have dropped on each of the last N ticks
+CHICKEN_TREND_MARGIN = 20  # ...and HP at most this many % above the chicken threshold
+LEAD_SAMPLES = 100
+
+# Chickening defaults
+DEFAULT_CHICKEN_ENABLED = False
+DEFAULT_CHICKEN_THRESHOLD = 30  # HP% below which to log out quickly
+MENU_POLL_INTERVAL = 0.01   # seconds between looks for the ESC menu
+EXIT_CACHE_POLL_TIME = 0.5  # how long to poll the remembered button patch
+MENU_POLL_TIMEOUT = 2.0     # give up on the exit button after this long
+EXIT_PATCH_MARGIN = 20      # pixels searched around the remembered button
+CHICKEN_LATENCY_SAMPLES = 100
+
+# Hot-path profiler (off by default; when off each hook is one attribute check)
+DEFAULT_PROFILE_ENABLED = False
+PROFILE_SAMPLES = 1000          # rolling window per stage
+PROFILE_STAGES = ("window", "capture", "convert", "count",
+                  "decision", "dispatch", "ui", "reaction")
+
+# NEW: Default increase percentage when poisoned (health bar turns green)
+DEFAULT_POISONED_THRESHOLD_INCREASE = 0
+
+# Capture defaults ("gdi" blits the screen into a raw BGRA buffer, "screen" goes
+# through pyautogui/PIL, "replay" serves image files)
+DEFAULT_CAPTURE_BACKEND = "gdi"
+
+# Fill estimator per region: "count" classifies every pixel, "probe" binary
+# searches a few columns for the filled/empty boundary (bars fill from the bottom)
+FILL_MODE_COUNT = "count"
+FILL_MODE_PROBE = "probe"
+FILL_MODES = (FILL_MODE_COUNT, FILL_MODE_PROBE)
+DEFAULT_FILL_MODE = FILL_MODE_COUNT
+PROBE_COLUMNS = 5
+
+# Region shape: "rect" uses every pixel and reports the raw pixel ratio, "orb"
+# only counts pixels inside the inscribed ellipse and reports liquid level
+GEOMETRY_RECT = "rect"
+GEOMETRY_ORB = "orb"
+GEOMETRIES = (GEOMETRY_RECT, GEOMETRY_ORB)
+DEFAULT_GEOMETRY = GEOMETRY_RECT
+
+# Reuse the previous fill value when a region's pixels did not change
+DEFAULT_SKIP_UNCHANGED_REGIONS = True
+FINGERPRINT_COLUMN_STRIDE = 2  # bars are uniform across a row, so skip columns
+
+# Settings that change what a reader returns for identical pixels
+DETECTION_SETTING_KEYS = ("USE_GRAY_AS_EMPTY", "COLOR_TIGHTENING",
+                          "HP_FILL_MODE", "MP_FILL_MODE",
+                          "HP_GEOMETRY", "MP_GEOMETRY")
+
+# Optional detector process: capture + fill detection run in a child process
+# (own GIL) and publish results through a shared-memory ring buffer
+DEFAULT_DETECT_PROCESS = False
+DETECT_RING_SLOTS = 64
+
+# Flask charges: each flask slot's liquid is counted inside the flask.png
+# silhouette scaled to the slot; presses are skipped while a flask holds less
+# than one use (FLASK_MIN_CHARGE, % of the slot)
+DEFAULT_FLASK_CHECK_ENABLED = True
+DEFAULT_FLASK_MIN_CHARGE = 15
+FLASK_ASSET = "flask.png"
+FLASK_KEYS = ("1", "2")  # potion keys that have a flask slot (health, mana)
+
+
+# ------------------------------------------------------------------------------
+# Clock and input (injectable so the loop can run against a simulator)
+# ------------------------------------------------------------------------------
+class SystemClock:
+    """
+    Wall clock: now() in perf_counter seconds, sleep() really sleeps and
+    wait() is the awaitable sleep the engine's asyncio tasks use.
+    """
+    def now(self):
+        return time.perf_counter()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+    async def wait(self, seconds, wake=None):
+        """Await `seconds`, returning early once the asyncio.Event `wake` is set."""
+        if wake is None:
+            await asyncio.sleep(seconds)
+            return
+        try:
+            await asyncio.wait_for(wake.wait(), seconds)
+        except asyncio.TimeoutError:
+            pass
+
+
+SYSTEM_CLOCK = SystemClock()
+
+
+class PyAutoGuiInput:
+    """Keyboard/mouse output through pyautogui, without its 0.1 s auto-pause."""
+    def press(self, key):
+        pyautogui.press(key, _pause=False)
+
+    def click(self, x, y):
+        pyautogui.click(x, y, _pause=False)
+
+
+class DryRunInput:
+    """Stand-in input backend: logs what would be pressed or clicked."""
+    def __init__(self, log=print):
+        self.log = log
+
+    def press(self, key):
+        self.log(f"[dry run] press {key}")
+
+    def click(self, x, y):
+        self.log(f"[dry run] click {x},{y}")
+
+
+# ------------------------------------------------------------------------------
+# HELPER FUNCTIONS ADDED (from second snippet for auto-find)
+# ------------------------------------------------------------------------------
+def list_windows():
+    """Return a list of visible window titles."""
+    windows = []
+    def enum_window(hwnd, _):
+        if win32gui.IsWindowVisible(hwnd):
+            t = win32gui.GetWindowText(hwnd)
+            if t:
+                windows.append(t)
+        return True
+    win32gui.EnumWindows(enum_window, None)
+    return windows
+
+def refine_template_crop(template_img, target_color="red"):
+    """
+    Crop a template image around the main cluster of target_color pixels,
+    so that matchTemplate won't look at empty areas.
+    """
+    hsv = cv2.cvtColor(template_img, cv2.COLOR_BGR2HSV)
+    if target_color.lower() == "red":
+        lower_red1 = np.array([0, 50, 50])
+        upper_red1 = np.array([10, 255, 255])
+        lower_red2 = np.array([160, 50, 50])
+        upper_red2 = np.array([180, 255, 255])
+        mask1 = cv2.inRange(hsv, lower_red1, upper_red1)
+        mask2 = cv2.inRange(hsv, lower_red2, upper_red2)
+        mask = cv2.bitwise_or(mask1, mask2)
+    elif target_color.lower() == "blue":
+        lower_blue = np.array([80, 50, 50])
+        upper_blue = np.array([140, 255, 255])
+        mask = cv2.inRange(hsv, lower_blue, upper_blue)
+    else:
+        return template_img  # no special handling
+
+    kernel = np.ones((3, 3), np.uint8)
+    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel, iterations=2)
+    coords = cv2.findNonZero(mask)
+    if coords is not None:
+        x, y, w, h = cv2.boundingRect(coords)
+        cropped = template_img[y : y + h, x : x + w]
+        return cropped
+    else:
+        return template_img
+
+def crop_by_max_color_column(template_img, target_color="red", slice_width=4, crop_percent=0.05):
+    """
+    Another helper that tries to locate the 'best' vertical slice of the image
+    that has the most of the target color, to reduce noise in the matchTemplate.
+    """
+    hsv = cv2.cvtColor(template_img, cv2.COLOR_BGR2HSV)
+    if target_color.lower() == "red":
+        lower_red1 = np.array([0, 70, 50])
+        upper_red1 = np.array([10, 255, 255])
+        lower_red2 = np.array([160, 70, 50])
+        upper_red2 = np.array([180, 255, 255])
+        mask1 = cv2.inRange(hsv, lower_red1, upper_red1)
+        mask2 = cv2.inRange(hsv, lower_red2, upper_red2)
+        mask = cv2.bitwise_or(mask1, mask2)
+    elif target_color.lower() == "blue":
+        lower_blue = np.array([80, 70, 50])
+        upper_blue = np.array([140, 255, 255])
+        mask = cv2.inRange(hsv, lower_blue, upper_blue)
+    else:
+        return template_img
+
+    col_sums = np.sum(mask > 0, axis=0)
+    max_col_index = int(np.argmax(col_sums))
+    h, w = template_img.shape[:2]
+    left = max(0, max_col_index - slice_width // 2)
+    right = min(w, left + slice_width)
+    cropped = template_img[:, left:right]
+
+    # Optionally remove top/bottom by crop_percent
+    crop_pixels = int(cropped.shape[0] * crop_percent)
+    cropped = cropped[crop_pixels : cropped.shape[0] - crop_pixels, :]
+
+    # Then refine again
+    cropped_refined = refine_template_crop(cropped, target_color=target_color)
+    return cropped_refined
+
+TemplateMatch = namedtuple("TemplateMatch", "score loc size scale in_roi seconds")
+
+
+def _top_matches(result, count, suppress_w, suppress_h):
+    """Return up to `count` (score, loc) peaks of a matchTemplate result, non-overlapping."""
+    result = result.copy()
+    matches = []
+    for _ in range(count):
+        _, val, _, loc = cv2.minMaxLoc(result)
+        if not np.isfinite(val) or val <= -1.0:
+            break
+        matches.append((val, loc))
+        x, y = loc
+        result[max(0, y - suppress_h) : y + suppress_h + 1,
+               max(0, x - suppress_w) : x + suppress_w + 1] = -1.0
+    return matches
+
+ScaledTemplate = namedtuple("ScaledTemplate", "scale image small_gray")
+
+
+def build_scaled_templates(template, scales=UI_SCALES):
+    """Return a ScaledTemplate (full-res BGR + downscaled gray) per UI scale."""
+    variants = []
+    for scale in scales:
+        if scale == 1.0:
+            tpl = template
+        else:
+            interp = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+            tpl = cv2.resize(template, None, fx=scale, fy=scale, interpolation=interp)
+        th, tw = tpl.shape[:2]
+        small_size = (max(1, round(tw * PYRAMID_SCALE)), max(1, round(th * PYRAMID_SCALE)))
+        small_gray = cv2.cvtColor(cv2.resize(tpl, small_size, interpolation=cv2.INTER_AREA),
+                                  cv2.COLOR_BGR2GRAY)
+        variants.append(ScaledTemplate(scale, tpl, small_gray))
+    return variants
+
+def match_template_pyramid(image, variants, roi=None):
+    """
+    Coarse-to-fine TM_CCOEFF_NORMED search of ScaledTemplate variants in a
+    BGR image. Candidates come from a grayscale match at PYRAMID_SCALE; each
+    is then re-matched in colour at full resolution inside a small window.
+    `roi` is (x, y, w, h) in image pixels. Returns (score, (x, y), (w, h),
+    scale) in image coordinates; score is -1 if nothing could be matched.
+    """
+    x0 = y0 = 0
+    if roi is not None:
+        x0, y0, roi_w, roi_h = roi
+        image = image[y0 : y0 + roi_h, x0 : x0 + roi_w]
+    img_h, img_w = image.shape[:2]
+    small = cv2.resize(image, None, fx=PYRAMID_SCALE, fy=PYRAMID_SCALE,
+                       interpolation=cv2.INTER_AREA)
+    small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    margin = int(round(1 / PYRAMID_SCALE)) + 1
+
+    best = (-1.0, None, None, None)
+    for scale, tpl, tpl_small in variants:
+        th, tw = tpl.shape[:2]
+        sh, sw = tpl_small.shape[:2]
+        if th > img_h or tw > img_w or sh > small.shape[0] or sw > small.shape[1]:
+            continue
+
+        coarse = cv2.matchTemplate(small, tpl_small, cv2.TM_CCOEFF_NORMED)
+        for _, (cx, cy) in _top_matches(coarse, PYRAMID_CANDIDATES, sw, sh):
+            fx, fy = int(cx / PYRAMID_SCALE), int(cy / PYRAMID_SCALE)
+            left, top = max(0, fx - margin), max(0, fy - margin)
+            right, bottom = min(img_w, fx + tw + margin), min(img_h, fy + th + margin)
+            window = image[top:bottom, left:right]
+            if window.shape[0] < th or window.shape[1] < tw:
+                continue
+            fine = cv2.matchTemplate(window, tpl, cv2.TM_CCOEFF_NORMED)
+            _, val, _, loc = cv2.minMaxLoc(fine)
+            if val > best[0]:
+                best = (val, (x0 + left + loc[0], y0 + top + loc[1]), (tw, th), scale)
+    return best
+
+def find_template(image, variants, roi_fraction):
+    """
+    Search the expected corner first, then the whole image if the corner
+    scores below AUTO_FIND_THRESHOLD. Returns a TemplateMatch.
+    """
+    start = time.perf_counter()
+    img_h, img_w = image.shape[:2]
+    fx, fy, fw, fh = roi_fraction
+    roi = (int(img_w * fx), int(img_h * fy), int(img_w * fw), int(img_h * fh))
+    score, loc, size, scale = match_template_pyramid(image, variants, roi=roi)
+    in_roi = True
+    if score < AUTO_FIND_THRESHOLD:
+        score, loc, size, scale = match_template_pyramid(image, variants)
+        in_roi = False
+    return TemplateMatch(score, loc, size, scale, in_roi, time.perf_counter() - start)
+
+def find_hp_mp_templates(image, hp_variants, mp_variants):
+    """Run the HP and MP searches concurrently (OpenCV releases the GIL)."""
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        hp_future = pool.submit(find_template, image, hp_variants, HP_SEARCH_ROI)
+        mp_future = pool.submit(find_template, image, mp_variants, MP_SEARCH_ROI)
+        return hp_future.result(), mp_future.result()
+
+
+# ------------------------------------------------------------------------------
+# Template store (assets loaded once, derived variants kept in memory)
+# ------------------------------------------------------------------------------
+class TemplateEntry:
+    """
+    One template asset and everything derived from it: the colour-cropped
+    template (refine_template_crop + crop_by_max_color_column when a target
+    colour is given), its grayscale version and the per-UI-scale pyramid
+    variants used by match_template_pyramid.
+    """
+    def __init__(self, path, mtime, target_color=None):
+        self.path = path
+        self.mtime = mtime
+        self.image = cv2.imread(path, cv2.IMREAD_COLOR)
+        if self.image is None:
+            raise ValueError(f"Could not read template {path}")
+        if target_color:
+            refined = refine_template_crop(self.image, target_color=target_color)
+            self.cropped = crop_by_max_color_column(refined, target_color=target_color,
+                                                    slice_width=4, crop_percent=0.05)
+        else:
+            self.cropped = self.image
+        self.gray = cv2.cvtColor(self.cropped, cv2.COLOR_BGR2GRAY)
+        self.variants = build_scaled_templates(self.cropped)
+
+
+class TemplateStore:
+    """
+    Loads template images from `directory` on first use and keeps them (and
+    their derived variants) in memory. Each get() stats the file and reloads
+    the entry if it was modified, so editing an asset needs no restart.
+    """
+    def __init__(self, directory=SCRIPT_DIR):
+        self.directory = directory
+        self.entries = {}
+
+    def get(self, name, target_color=None):
+        """Return the TemplateEntry for `name`, or None if the file is missing."""
+        path = os.path.join(self.directory, name)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            self.entries.pop((name, target_color), None)
+            return None
+        entry = self.entries.get((name, target_color))
+        if entry is None or entry.mtime != mtime:
+            entry = TemplateEntry(path, mtime, target_color)
+            self.entries[(name, target_color)] = entry
+        return entry
+
+    def preload(self):
+        """Warm the store with every bundled template (called at startup)."""
+        for name, color in TEMPLATE_ASSETS:
+            try:
+                self.get(name, color)
+            except ValueError:
+                pass
+
+
+# (file name, colour crop) for every template the bot uses
+HP_TEMPLATE = ("health.png", "red")
+MP_TEMPLATE = ("mana.png", "blue")
+EXIT_TEMPLATE = ("exit_to_log_in_screen.png", None)
+TEMPLATE_ASSETS = (HP_TEMPLATE, MP_TEMPLATE, EXIT_TEMPLATE)
+
+_template_store = None
+
+def get_template_store():
+    """Return the shared TemplateStore."""
+    global _template_store
+    if _template_store is None:
+        _template_store = TemplateStore()
+    return _template_store
+
+def locate_template_gray(gray_image, entry, confidence=0.8):
+    """
+    Grayscale TM_CCOEFF_NORMED match of entry.gray in gray_image (what
+    pyautogui.locateOnScreen(grayscale=True) does, minus reloading the file).
+    Returns (x, y, w, h) in gray_image coordinates or None.
+    """
+    th, tw = entry.gray.shape[:2]
+    if gray_image.shape[0] < th or gray_image.shape[1] < tw:
+        return None
+    result = cv2.matchTemplate(gray_image, entry.gray, cv2.TM_CCOEFF_NORMED)
+    _, max_val, _, max_loc = cv2.minMaxLoc(result)
+    if max_val < confidence:
+        return None
+    return (max_loc[0], max_loc[1], tw, th)
+
+class ExitButtonLocator:
+    """
+    Finds the "Exit to Log In Screen" button after ESC. The button's offset
+    inside the game window is remembered per window size, so a chicken
+    normally only polls that small patch until the menu is drawn. The
+    full-window search is the fallback when nothing is remembered or the
+    patch keeps missing.
+
+    Saved offsets come from the settings snapshot; new ones are kept here
+    for the session and handed to `on_learned(positions)`, which must store
+    them on the thread that owns CONFIG (nothing is saved without it).
+    """
+    def __init__(self, capture, clock=SYSTEM_CLOCK, on_learned=None):
+        self.capture = capture
+        self.clock = clock
+        self.on_learned = on_learned
+        self.positions = {}    # offsets found this session, by window size
+        self.last_path = None  # "cached", "full" or "screen"
+
+    def _match(self, box, entry):
+        """Look for the button in `box` (the whole screen if None) in one grab."""
+        frame = self.capture.grab([box or screen_rect()])
+        if frame is None:
+            return None
+        gray = cv2.cvtColor(frame.pixels, cv2.COLOR_BGRA2GRAY)
+        found = locate_template_gray(gray, entry, confidence=0.8)
+        if found is None:
+            return None
+        return (frame.left + found[0], frame.top + found[1], found[2], found[3])
+
+    def _patch(self, rect, offset):
+        x, y, w, h = rect
+        dx, dy, bw, bh = offset
+        left = max(x, x + dx - EXIT_PATCH_MARGIN)
+        top = max(y, y + dy - EXIT_PATCH_MARGIN)
+        right = min(x + w, x + dx + bw + EXIT_PATCH_MARGIN)
+        bottom = min(y + h, y + dy + bh + EXIT_PATCH_MARGIN)
+        return [left, top, right - left, bottom - top]
+
+    async def locate(self, rect, entry, start=None):
+        """
+        Poll for the button inside the game window `rect` until found or
+        MENU_POLL_TIMEOUT passes since `start`. Returns (x, y, w, h) in
+        screen coordinates or None.
+        """
+        start = self.clock.now() if start is None else start
+        if rect is None:
+            # No window to anchor a cache to: one full-screen look
+            self.last_path = "screen"
+            return self._match(None, entry)
+
+        key = f"{rect[2]}x{rect[3]}"
+        offset = self.positions.get(key) or get_settings().exit_buttons.get(key)
+        while True:
+            elapsed = self.clock.now() - start
+            if offset and elapsed < EXIT_CACHE_POLL_TIME:
+                self.last_path = "cached"
+                btn = self._match(self._patch(rect, offset), entry)
+            else:
+                self.last_path = "full"
+                btn = self._match(list(rect), entry)
+                if btn:
+                    self.remember(key, rect, btn)
+            if btn or elapsed >= MENU_POLL_TIMEOUT:
+                return btn
+            await self.clock.wait(MENU_POLL_INTERVAL)
+
+    def remember(self, key, rect, btn):
+        self.positions[key] = [btn[0] - rect[0], btn[1] - rect[1], btn[2], btn[3]]
+        if self.on_learned is not None:
+            self.on_learned({**get_settings().exit_buttons, **self.positions})
+
+
+# ------------------------------------------------------------------------------
+# Latency statistics
+# ------------------------------------------------------------------------------
+class LatencyStats:
+    """Keeps the last `size` samples (seconds) and reports percentiles."""
+    def __init__(self, size):
+        self.samples = deque(maxlen=size)
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+
+    def percentile(self, p):
+        return self.percentiles(p)[0]
+
+    def percentiles(self, *ps):
+        if not self.samples:
+            return [0.0] * len(ps)
+        values = np.percentile(np.fromiter(self.samples, float), ps)
+        return [float(v) for v in values]
+
+    def summary(self):
+        """e.g. 'p50 120 ms, p99 480 ms over 12'"""
+        return (f"p50 {self.percentile(50) * 1000:.0f} ms, "
+                f"p99 {self.percentile(99) * 1000:.0f} ms over {len(self.samples)}")
+
+
+class StageProfiler:
+    """
+    Rolling per-stage timings for the monitor loop. Hooks are written as
+
+        lap = profiler.begin()
+        ...stage work...
+        lap = profiler.lap("capture", lap)
+
+    begin() returns None while disabled and lap() passes None straight
+    through, so an idle profiler costs one call per hook and no clock reads.
+    "reaction" is frame captured -> potion key actually pressed.
+    """
+    def __init__(self, size=PROFILE_SAMPLES):
+        self.enabled = False
+        self.stages = {stage: LatencyStats(size) for stage in PROFILE_STAGES}
+        self.ticks = LatencyStats(size)
+        self._last_tick = None
+
+    def begin(self):
+        return time.perf_counter() if self.enabled else None
+
+    def lap(self, stage, start):
+        """Record time since `start` under `stage`; returns the new start."""
+        if start is None:
+            return None
+        now = time.perf_counter()
+        self.stages[stage].add(now - start)
+        return now
+
+    def record(self, stage, seconds):
+        if self.enabled:
+            self.stages[stage].add(seconds)
+
+    def tick(self):
+        """Mark the start of a monitor loop iteration (for the tick rate)."""
+        if not self.enabled:
+            self._last_tick = None
+            return
+        now = time.perf_counter()
+        if self._last_tick is not None:
+            self.ticks.add(now - self._last_tick)
+        self._last_tick = now
+
+    def tick_rate(self):
+        interval = self.ticks.percentile(50)
+        return 1.0 / interval if interval else 0.0
+
+    def reset(self):
+        for stats in self.stages.values():
+            stats.samples.clear()
+        self.ticks.samples.clear()
+        self._last_tick = None
+
+    def rows(self):
+        """
+        One dict per stage: samples and p50/p95/p99 in milliseconds. The last
+        row, "tick", is the interval between loop iterations.
+        """
+        rows = []
+        for stage, stats in (*self.stages.items(), ("tick", self.ticks)):
+            p50, p95, p99 = stats.percentiles(50, 95, 99)
+            rows.append({"stage": stage, "samples": len(stats.samples),
+                         "p50_ms": round(p50 * 1000, 3),
+                         "p95_ms": round(p95 * 1000, 3),
+                         "p99_ms": round(p99 * 1000, 3)})
+        return rows
+
+    def summary(self):
+        lines = [f"{'stage':<10}{'n':>6}{'p50':>9}{'p95':>9}{'p99':>9}  (ms)"]
+        for row in self.rows():
+            lines.append(f"{row['stage']:<10}{row['samples']:>6}{row['p50_ms']:>9.2f}"
+                         f"{row['p95_ms']:>9.2f}{row['p99_ms']:>9.2f}")
+        lines.append(f"tick rate {self.tick_rate():.1f} Hz")
+        return "\n".join(lines)
+
+    def export(self, path):
+        """Write the current rows to `path` as JSON (.json) or CSV (anything else)."""
+        rows = self.rows()
+        if path.lower().endswith(".json"):
+            with open(path, "w") as f:
+                json.dump({"tick_rate_hz": round(self.tick_rate(), 2), "stages": rows},
+                          f, indent=4)
+            return
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+_profiler = None
+
+def get_profiler():
+    """Return the shared StageProfiler."""
+    global _profiler
+    if _profiler is None:
+        _profiler = StageProfiler()
+    return _profiler
+
+
+# ------------------------------------------------------------------------------
+# Load & Save Config
+# ------------------------------------------------------------------------------
+def default_config():
+    """Return a fresh settings dict with every default filled in."""
+    return {
+        "HP_REGION": [],
+        "MP_REGION": [],
+        "THRESHOLD_HP_LOWER": DEFAULT_THRESHOLD_HP_LOWER,
+        "THRESHOLD_HP_UPPER": DEFAULT_THRESHOLD_HP_UPPER,
+        "THRESHOLD_MP_LOWER": DEFAULT_THRESHOLD_MP_LOWER,
+        "THRESHOLD_MP_UPPER": DEFAULT_THRESHOLD_MP_UPPER,
+        "COLOR_TIGHTENING": DEFAULT_COLOR_TIGHTENING,
+        "HEALTH_POTION_DELAY": DEFAULT_HEALTH_POTION_DELAY,
+        "MANA_POTION_DELAY": DEFAULT_MANA_POTION_DELAY,
+        "TOGGLE_KEY": DEFAULT_TOGGLE_KEY,
+        "PAUSE_KEY": DEFAULT_PAUSE_KEY,
+        "SINGLE_SCREEN_HOTKEY": DEFAULT_SINGLE_SCREEN_HOTKEY,
+        "USE_GRAY_AS_EMPTY": False,
+        "TARGET_WINDOW_TITLE": "Path of Exile 2",
+        "SHOW_THRESHOLD_OVERLAY": False,
+        "CHICKEN_ENABLED": DEFAULT_CHICKEN_ENABLED,
+        "CHICKEN_THRESHOLD": DEFAULT_CHICKEN_THRESHOLD,
+        # NEW: Poisoned threshold increase percentage
+        "POISONED_THRESHOLD_INCREASE": DEFAULT_POISONED_THRESHOLD_INCREASE,
+        "CAPTURE_BACKEND": DEFAULT_CAPTURE_BACKEND,
+        "REPLAY_PATH": "",
+        "HP_FILL_MODE": DEFAULT_FILL_MODE,
+        "MP_FILL_MODE": DEFAULT_FILL_MODE,
+        "HP_GEOMETRY": DEFAULT_GEOMETRY,
+        "MP_GEOMETRY": DEFAULT_GEOMETRY,
+        "SKIP_UNCHANGED_REGIONS": DEFAULT_SKIP_UNCHANGED_REGIONS,
+        "MIN_TICK_RATE": DEFAULT_MIN_TICK_RATE,
+        "MAX_TICK_RATE": DEFAULT_MAX_TICK_RATE,
+        "POTION_VERIFY_ENABLED": DEFAULT_POTION_VERIFY_ENABLED,
+        "POTION_VERIFY_WINDOW": DEFAULT_POTION_VERIFY_WINDOW,
+        "EXIT_BUTTON_POSITIONS": {},
+        "PROFILE_ENABLED": DEFAULT_PROFILE_ENABLED,
+        "PREDICT_ENABLED": DEFAULT_PREDICT_ENABLED,
+        "DETECT_PROCESS": DEFAULT_DETECT_PROCESS,
+        "FLASK_REGIONS": {},
+        "FLASK_CHECK_ENABLED": DEFAULT_FLASK_CHECK_ENABLED,
+        "FLASK_MIN_CHARGE": DEFAULT_FLASK_MIN_CHARGE,
+    }
+
+def read_config_file():
+    """config.json laid over default_config() as a new dict; CONFIG is not touched."""
+    # Keys added since the file was saved fall back to their defaults
+    config = default_config()
+    with open(CONFIG_FILE, "r") as f:
+        config.update(json.load(f))
+    return config
+
+def session_config():
+    """CONFIG with CONFIG_OVERRIDES laid over it, as a new dict."""
+    return {**CONFIG, **CONFIG_OVERRIDES}
+
+def install_config(config, settings=None):
+    """
+    Make `config` the current settings: CONFIG takes its contents and the
+    snapshot (compiled from it unless given) is published with one
+    assignment. CONFIG is updated in place because the GUI and the engine
+    share this one dict, so only the thread that owns it may call this
+    (the Tk thread in the GUI).
+    """
+    global _settings
+    settings = settings or ConfigSnapshot(config, _settings)
+    CONFIG.clear()
+    CONFIG.update(config)
+    _settings = settings
+    return settings
+
+def load_config():
+    global _config_mtime
+    if os.path.exists(CONFIG_FILE):
+        _config_mtime = config_file_mtime()
+        install_config(read_config_file())
+    else:
+        CONFIG.clear()
+        CONFIG.update(default_config())
+        save_config()
+
+def save_config():
+    """Write CONFIG to disk and swap in a snapshot compiled from it."""
+    global _config_mtime
+    with open(CONFIG_FILE, "w") as f:
+        json.dump(CONFIG, f, indent=4)
+    _config_mtime = config_file_mtime()
+    compile_config()
+
+def config_file_mtime():
+    try:
+        return os.stat(CONFIG_FILE).st_mtime_ns
+    except OSError:
+        return None
+
+def read_changed_config():
+    """
+    Hot reload check, safe from any thread: if config.json was loaded or
+    saved by this process and has been modified since, return the new
+    (config, snapshot) without touching CONFIG; otherwise None. The
+    owner of CONFIG applies them with install_config().
+    """
+    global _config_mtime
+    if _config_mtime is None:
+        return None
+    mtime = config_file_mtime()
+    if mtime is None or mtime == _config_mtime:
+        return None
+    try:
+        config = read_config_file()
+    except (OSError, ValueError):
+        return None  # half-written file: try again on the next check
+    _config_mtime = mtime
+    return config, ConfigSnapshot(config, _settings)
+
+
+# ------------------------------------------------------------------------------
+# Compiled config snapshot (what the hot loop reads)
+# ------------------------------------------------------------------------------
+class ConfigSnapshot:
+    """
+    Immutable, typed copy of CONFIG for the monitor loop and the detectors,
+    with derived values worked out once: validated region tuples, the
+    flask slots to read, the poison multiplier, the fill cache's settings
+    key and the color lookup table. A tick takes one reference with
+    get_settings() and then only reads slots. compile_config() and
+    install_config() replace the shared snapshot with one assignment, so
+    a tick sees all of a settings change or none of it.
+    """
+    __slots__ = ("hp_region", "mp_region", "capture_regions",
+                 "hp_lower", "hp_upper", "mp_lower", "mp_upper",
+                 "hp_delay", "mp_delay", "poison_factor",
+                 "chicken_enabled", "chicken_threshold", "predict",
+                 "verify_enabled", "verify_window", "show_overlay",
+                 "min_tick_rate", "max_tick_rate", "detect_process", "window_title",
+                 "flask_slots", "flask_min_charge", "exit_buttons",
+                 "use_gray", "color_tightening", "hp_probe", "mp_probe", "hp_orb", "mp_orb",
+                 "skip_unchanged", "detection_key", "_classifier")
+
+    def __init__(self, config, previous=None):
+        def region(value):
+            return tuple(int(v) for v in value) if value and len(value) == 4 else None
+
+        flask_slots = ()
+        if config.get("FLASK_CHECK_ENABLED", DEFAULT_FLASK_CHECK_ENABLED):
+            flask_regions = config.get("FLASK_REGIONS") or {}
+            flask_slots = tuple((key, region(flask_regions.get(key))) for key in FLASK_KEYS
+                                if region(flask_regions.get(key)))
+
+        values = {
+            "hp_region": region(config.get("HP_REGION")),
+            "mp_region": region(config.get("MP_REGION")),
+            "hp_lower": float(config.get("THRESHOLD_HP_LOWER", DEFAULT_THRESHOLD_HP_LOWER)),
+            "hp_upper": float(config.get("THRESHOLD_HP_UPPER", DEFAULT_THRESHOLD_HP_UPPER)),
+            "mp_lower": float(config.get("THRESHOLD_MP_LOWER", DEFAULT_THRESHOLD_MP_LOWER)),
+            "mp_upper": float(config.get("THRESHOLD_MP_UPPER", DEFAULT_THRESHOLD_MP_UPPER)),
+            "hp_delay": float(config.get("HEALTH_POTION_DELAY", DEFAULT_HEALTH_POTION_DELAY)),
+            "mp_delay": float(config.get("MANA_POTION_DELAY", DEFAULT_MANA_POTION_DELAY)),
+            "poison_factor": 1 + float(config.get("POISONED_THRESHOLD_INCREASE",
+                                                  DEFAULT_POISONED_THRESHOLD_INCREASE)) / 100,
+            "chicken_enabled": bool(config.get("CHICKEN_ENABLED", DEFAULT_CHICKEN_ENABLED)),
+            "chicken_threshold": float(config.get("CHICKEN_THRESHOLD", DEFAULT_CHICKEN_THRESHOLD)),
+            "predict": bool(config.get("PREDICT_ENABLED", DEFAULT_PREDICT_ENABLED)),
+            "verify_enabled": bool(config.get("POTION_VERIFY_ENABLED", DEFAULT_POTION_VERIFY_ENABLED)),
+            "verify_window": float(config.get("POTION_VERIFY_WINDOW", DEFAULT_POTION_VERIFY_WINDOW)),
+            "show_overlay": bool(config.get("SHOW_THRESHOLD_OVERLAY", False)),
+            "min_tick_rate": float(config.get("MIN_TICK_RATE", DEFAULT_MIN_TICK_RATE)),
+            "max_tick_rate": float(config.get("MAX_TICK_RATE", DEFAULT_MAX_TICK_RATE)),
+            "detect_process": bool(config.get("DETECT_PROCESS", DEFAULT_DETECT_PROCESS)),
+            "window_title": str(config.get("TARGET_WINDOW_TITLE", "Path of Exile 2")),
+            "flask_slots": flask_slots,
+            "flask_min_charge": float(config.get("FLASK_MIN_CHARGE", DEFAULT_FLASK_MIN_CHARGE)),
+            "exit_buttons": dict(config.get("EXIT_BUTTON_POSITIONS") or {}),
+            "use_gray": bool(config.get("USE_GRAY_AS_EMPTY", False)),
+            "color_tightening": config.get("COLOR_TIGHTENING", DEFAULT_COLOR_TIGHTENING),
+            "hp_probe": config.get("HP_FILL_MODE", DEFAULT_FILL_MODE) == FILL_MODE_PROBE,
+            "mp_probe": config.get("MP_FILL_MODE", DEFAULT_FILL_MODE) == FILL_MODE_PROBE,
+            "hp_orb": config.get("HP_GEOMETRY", DEFAULT_GEOMETRY) == GEOMETRY_ORB,
+            "mp_orb": config.get("MP_GEOMETRY", DEFAULT_GEOMETRY) == GEOMETRY_ORB,
+            "skip_unchanged": bool(config.get("SKIP_UNCHANGED_REGIONS",
+                                              DEFAULT_SKIP_UNCHANGED_REGIONS)),
+            "detection_key": tuple(config.get(k) for k in DETECTION_SETTING_KEYS),
+        }
+        values["capture_regions"] = ([r for r in (values["hp_region"], values["mp_region"]) if r] +
+                                     [r for _, r in flask_slots])
+        # The color table only depends on COLOR_TIGHTENING: carry it over
+        classifier = None
+        if previous is not None and previous.color_tightening == values["color_tightening"]:
+            classifier = previous._classifier
+        values["_classifier"] = classifier
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ConfigSnapshot is immutable; change CONFIG and call compile_config()")
+
+    @property
+    def classifier(self):
+        """The ColorClassifier for color_tightening (table built on first use)."""
+        classifier = self._classifier
+        if classifier is None:
+            classifier = ColorClassifier(self.color_tightening)
+            object.__setattr__(self, "_classifier", classifier)
+        return classifier
+
+
+_settings = None
+_config_mtime = None  # config.json mtime as last loaded/saved, None if never
+
+def get_settings():
+    """Return the current ConfigSnapshot (compiled from CONFIG on first use)."""
+    if _settings is None:
+        return compile_config()
+    return _settings
+
+def compile_config():
+    """Compile CONFIG into a new snapshot and make it the current one."""
+    global _settings
+    _settings = ConfigSnapshot(CONFIG, _settings)
+    return _settings
+
+
+# ------------------------------------------------------------------------------
+# Window detection
+# ------------------------------------------------------------------------------
+class WindowTracker:
+    """
+    Cached state of the configured game window. The handle is looked up by
+    title once and, like the window rect, only re-read every
+    WINDOW_REFRESH_INTERVAL seconds or after invalidate(). Focus comes from
+    a WinEvent hook (EVENT_SYSTEM_FOREGROUND) running on its own thread, so
+    a normal tick makes no window-manager calls at all; if the hook cannot
+    be installed, focus is polled every FOCUS_POLL_INTERVAL instead.
+    """
+    def __init__(self):
+        self.hwnd = 0
+        self.rect = None
+        self.foreground = 0
+        self.events_active = False
+        self.last_refresh = float("-inf")
+        self.last_focus_poll = float("-inf")
+        self._event_thread = None
+
+    def invalidate(self):
+        """Force a fresh lookup next time (title changed, window recreated...)."""
+        self.last_refresh = float("-inf")
+        self.last_focus_poll = float("-inf")
+
+    def refresh(self):
+        hwnd = win32gui.FindWindow(None, get_settings().window_title)
+        self.hwnd = hwnd
+        if hwnd:
+            left, top, right, bottom = win32gui.GetWindowRect(hwnd)
+            self.rect = (left, top, right - left, bottom - top)
+        else:
+            self.rect = None
+        self.foreground = win32gui.GetForegroundWindow()
+        now = time.perf_counter()
+        self.last_refresh = now
+        self.last_focus_poll = now
+        if self._event_thread is None:
+            self._event_thread = threading.Thread(target=self._run_event_hook, daemon=True)
+            self._event_thread.start()
+
+    def _maybe_refresh(self):
+        now = time.perf_counter()
+        if now - self.last_refresh >= WINDOW_REFRESH_INTERVAL:
+            self.refresh()
+        elif not self.events_active and now - self.last_focus_poll >= FOCUS_POLL_INTERVAL:
+            self.foreground = win32gui.GetForegroundWindow()
+            self.last_focus_poll = now
+
+    def find(self):
+        """Return the window handle, or 0 if the window does not exist."""
+        self._maybe_refresh()
+        return self.hwnd
+
+    def get_rect(self):
+        """Return (left, top, width, height) for the window, or None."""
+        self._maybe_refresh()
+        return self.rect
+
+    def is_focused(self):
+        self._maybe_refresh()
+        return bool(self.hwnd) and self.foreground == self.hwnd
+
+    def bring_to_front(self):
+        """SetForegroundWindow on the game window (raises like win32gui does)."""
+        if self.find():
+            win32gui.SetForegroundWindow(self.hwnd)
+
+    def _run_event_hook(self):
+        """Hook foreground changes and pump messages for the hook (own thread)."""
+        try:
+            import ctypes
+            from ctypes import wintypes
+            EVENT_SYSTEM_FOREGROUND = 0x0003
+            WINEVENT_OUTOFCONTEXT = 0x0000
+            WinEventProc = ctypes.WINFUNCTYPE(
+                None, wintypes.HANDLE, wintypes.DWORD, wintypes.HWND,
+                wintypes.LONG, wintypes.LONG, wintypes.DWORD, wintypes.DWORD)
+
+            def on_foreground(hook, event, hwnd, id_object, id_child, thread, event_time):
+                self.foreground = hwnd or 0
+
+            # Keep a reference so the callback is not garbage collected
+            self._event_proc = WinEventProc(on_foreground)
+            hook = ctypes.windll.user32.SetWinEventHook(
+                EVENT_SYSTEM_FOREGROUND, EVENT_SYSTEM_FOREGROUND, 0,
+                self._event_proc, 0, 0, WINEVENT_OUTOFCONTEXT)
+            if not hook:
+                return
+            self.events_active = True
+            win32gui.PumpMessages()
+        except Exception:
+            pass
+        finally:
+            self.events_active = False
+
+
+class FakeWindowTracker:
+    """
+    Stand-in WindowTracker for Linux/tests: reports a window with a fixed
+    rect; tests flip `exists` / `focused` to simulate alt-tabbing etc.
+    """
+    def __init__(self, rect=(0, 0, 1920, 1080), focused=True, exists=True):
+        self.rect = rect
+        self.focused = focused
+        self.exists = exists
+
+    def invalidate(self):
+        pass
+
+    def find(self):
+        return 1 if self.exists else 0
+
+    def get_rect(self):
+        return self.rect if self.exists else None
+
+    def is_focused(self):
+        return self.exists and self.focused
+
+    def bring_to_front(self):
+        if self.exists:
+            self.focused = True
+
+
+_window_tracker = None
+
+def get_window_tracker():
+    """Return the shared tracker (win32-backed, or the fake one off Windows)."""
+    global _window_tracker
+    if _window_tracker is None:
+        _window_tracker = WindowTracker() if win32gui is not None else FakeWindowTracker()
+    return _window_tracker
+
+def get_game_window_rect():
+    """Return (left, top, width, height) for the configured window, or None."""
+    return get_window_tracker().get_rect()
+
+
+# ------------------------------------------------------------------------------
+# Frame capture (one grab per tick, shared by every reader)
+# ------------------------------------------------------------------------------
+def regions_bbox(regions):
+    """Return (left, top, width, height) enclosing all valid regions, or None."""
+    valid = [r for r in regions if r and len(r) == 4]
+    if not valid:
+        return None
+    left = min(r[0] for r in valid)
+    top = min(r[1] for r in valid)
+    right = max(r[0] + r[2] for r in valid)
+    bottom = max(r[1] + r[3] for r in valid)
+    return (left, top, right - left, bottom - top)
+
+
+class Frame:
+    """
+    A single captured image plus the screen position of its top-left pixel.
+    Pixels are always BGRA (h, w, 4) uint8. Readers take numpy views into it,
+    so one grab serves HP and MP alike.
+    """
+    def __init__(self, pixels, left=0, top=0, timestamp=None):
+        self.pixels = pixels
+        self.left = left
+        self.top = top
+        self.timestamp = time.time() if timestamp is None else timestamp
+
+    def view(self, region):
+        """Return a BGRA view of the given screen region, or None if it lies outside the frame."""
+        if not region or len(region) != 4:
+            return None
+        x, y, w, h = region
+        x0, y0 = x - self.left, y - self.top
+        frame_h, frame_w = self.pixels.shape[:2]
+        if x0 < 0 or y0 < 0 or x0 + w > frame_w or y0 + h > frame_h:
+            return None
+        return self.pixels[y0 : y0 + h, x0 : x0 + w]
+
+
+def screen_rect():
+    """Return [left, top, width, height] of the desktop, or None if it cannot be read."""
+    if win32gui is not None:
+        left, top, right, bottom = win32gui.GetWindowRect(win32gui.GetDesktopWindow())
+        return [left, top, right - left, bottom - top]
+    if pyautogui is not None:
+        width, height = pyautogui.size()
+        return [0, 0, width, height]
+    return None
+
+
+class ScreenCapture:
+    """
+    Grabs the bounding box of all requested regions in one pyautogui
+    screenshot. Portable fallback; GdiCapture avoids the PIL round-trip.
+    """
+    def grab(self, regions):
+        box = regions_bbox(regions)
+        if box is None:
+            return None
+        screenshot = pyautogui.screenshot(region=box)
+        pixels = cv2.cvtColor(np.asarray(screenshot), cv2.COLOR_RGB2BGRA)
+        return Frame(pixels, box[0], box[1])
+
+    def close(self):
+        pass
+
+
+class GdiCapture:
+    """
+    Blits the bounding box of all requested regions from the desktop DC into
+    a reusable GDI bitmap and wraps its raw BGRA bits in a numpy array.
+    No PIL image is created and there is no RGB->BGR conversion; the
+    bitmap is only reallocated when the box size changes.
+    """
+    def __init__(self):
+        self._hwnd = win32gui.GetDesktopWindow()
+        self._window_dc = win32gui.GetWindowDC(self._hwnd)
+        self._src_dc = win32ui.CreateDCFromHandle(self._window_dc)
+        self._mem_dc = self._src_dc.CreateCompatibleDC()
+        self._bitmap = None
+        self._size = None
+
+    def _ensure_bitmap(self, w, h):
+        if self._size == (w, h):
+            return
+        if self._bitmap is not None:
+            win32gui.DeleteObject(self._bitmap.GetHandle())
+        self._bitmap = win32ui.CreateBitmap()
+        self._bitmap.CreateCompatibleBitmap(self._src_dc, w, h)
+        self._mem_dc.SelectObject(self._bitmap)
+        self._size = (w, h)
+
+    def grab(self, regions):
+        box = regions_bbox(regions)
+        if box is None:
+            return None
+        x, y, w, h = box
+        self._ensure_bitmap(w, h)
+        self._mem_dc.BitBlt((0, 0), (w, h), self._src_dc, (x, y), win32con.SRCCOPY)
+        bits = self._bitmap.GetBitmapBits(True)
+        pixels = np.frombuffer(bits, dtype=np.uint8).reshape(h, w, 4)
+        return Frame(pixels, x, y)
+
+    def close(self):
+        if self._bitmap is not None:
+            win32gui.DeleteObject(self._bitmap.GetHandle())
+            self._bitmap = None
+        self._mem_dc.DeleteDC()
+        self._src_dc.DeleteDC()
+        win32gui.ReleaseDC(self._hwnd, self._window_dc)
+
+
+class ReplayCapture:
+    """
+    Serves frames from image files instead of the screen (works on Linux,
+    no game needed). Each image is treated as a capture whose top-left pixel
+    sits at `origin`; with loop=True the sequence repeats forever.
+    """
+    def __init__(self, path, origin=(0, 0), loop=True):
+        if os.path.isdir(path):
+            files = sorted(
+                os.path.join(path, f) for f in os.listdir(path)
+                if f.lower().endswith((".png", ".jpg", ".bmp"))
+            )
+        else:
+            files = [path]
+        # Convert to BGRA once at load so grab() hands out frames as-is
+        self.frames = []
+        for f in files:
+            img = cv2.imread(f, cv2.IMREAD_COLOR)
+            if img is not None:
+                self.frames.append(cv2.cvtColor(img, cv2.COLOR_BGR2BGRA))
+        if not self.frames:
+            raise ValueError(f"No replay frames found at {path}")
+        self.origin = origin
+        self.loop = loop
+        self.index = 0
+
+    def grab(self, regions):
+        if self.index >= len(self.frames):
+            if not self.loop:
+                return None
+            self.index = 0
+        pixels = self.frames[self.index]
+        self.index += 1
+        return Frame(pixels, self.origin[0], self.origin[1])
+
+    def close(self):
+        pass
+
+
+def create_capture_backend():
+    """Build the capture backend selected by CAPTURE_BACKEND (command line overrides first)."""
+    config = session_config()
+    backend = config.get("CAPTURE_BACKEND", DEFAULT_CAPTURE_BACKEND)
+    if backend == "replay":
+        return ReplayCapture(config.get("REPLAY_PATH", ""))
+    if backend == "gdi" and win32ui is not None:
+        return GdiCapture()
+    return ScreenCapture()
+
+
+# ------------------------------------------------------------------------------
+# Color classification (lookup table instead of per-tick HSV + inRange)
+# ------------------------------------------------------------------------------
+# Pixel class flags stored in the lookup table; a pixel may carry several
+CLASS_RED = 1
+CLASS_GREEN = 2
+CLASS_BLUE = 4
+CLASS_DARK = 8  # grayscale < GRAY_EMPTY_THRESHOLD, used by USE_GRAY_AS_EMPTY
+GRAY_EMPTY_THRESHOLD = 100
+LUT_SIZE = 1 << 24  # one entry per BGR color, indexed by the packed pixel
+
+ColorCounts = namedtuple("ColorCounts", "red green blue dark empty total")
+
+
+def blue_hue_bounds(tighten):
+    """Return the (lower, upper) mana hue range narrowed by COLOR_TIGHTENING."""
+    center_blue = 110
+    half_width_blue = 30 * (1 - tighten/100)
+    return (max(80, int(center_blue-half_width_blue)),
+            min(140, int(center_blue+half_width_blue)))
+
+
+def hue_class_table(tighten):
+    """Class flags for each OpenCV hue (0-179) of a saturated pixel."""
+    table = np.zeros(256, np.uint8)
+    table[:11] |= CLASS_RED
+    table[160:] |= CLASS_RED
+    table[40:81] |= CLASS_GREEN
+    blue_lo, blue_hi = blue_hue_bounds(tighten)
+    table[blue_lo:blue_hi + 1] |= CLASS_BLUE
+    return table
+
+
+def classify_bgr(bgr, tighten=0):
+    """
+    Class flags per pixel of a BGR image, straight from cv2.cvtColor and
+    the detectors' HSV ranges. This is the reference the lookup table is
+    built from (and checked against).
+    """
+    hsv = cv2.cvtColor(bgr, cv2.COLOR_BGR2HSV)
+    saturated = cv2.inRange(hsv, (0, 50, 50), (255, 255, 255))
+    flags = cv2.bitwise_and(cv2.LUT(cv2.extractChannel(hsv, 0), hue_class_table(tighten)),
+                            saturated)
+    gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+    _, dark = cv2.threshold(gray, GRAY_EMPTY_THRESHOLD - 1, CLASS_DARK, cv2.THRESH_BINARY_INV)
+    return cv2.bitwise_or(flags, dark)
+
+
+class ColorClassifier:
+    """
+    BGR -> class-flag lookup table with one entry for every 24-bit color, so
+    it labels exactly as the per-tick HSV + inRange test it replaces. The
+    table (16 MB) is built once per COLOR_TIGHTENING, in about half a
+    second; MonitorEngine warms it up before the first tick. Afterwards a
+    region is labelled with one indexed gather and red/green/blue/dark/empty
+    are counted in a single bincount.
+    """
+    def __init__(self, tighten=0):
+        self.tighten = tighten
+        # Entry i is the color whose packed BGRA pixel has i in its low 24 bits
+        colors = np.arange(LUT_SIZE, dtype=np.uint32).view(np.uint8).reshape(4096, 4096, 4)
+        bgr = np.ascontiguousarray(colors[..., :3])
+        self.lut = classify_bgr(bgr, tighten).reshape(-1)
+
+        self._lut_view = memoryview(self.lut)  # scalar lookups without a copy
+
+        # Which bincount slots contain each flag
+        slots = np.arange(16)
+        self._red_slots = (slots & CLASS_RED) > 0
+        self._green_slots = (slots & CLASS_GREEN) > 0
+        self._blue_slots = (slots & CLASS_BLUE) > 0
+        self._dark_slots = (slots & CLASS_DARK) > 0
+        self._empty_slots = (slots & (CLASS_RED | CLASS_GREEN | CLASS_BLUE)) == 0
+
+    def label(self, pixels):
+        """Return the per-pixel class flags for a BGRA view."""
+        # Read each BGRA pixel as one little-endian uint32 (0xAARRGGBB);
+        # dropping alpha leaves the table index
+        return self.label_packed(pixels.view(np.uint32)[..., 0])
+
+    def label_packed(self, packed):
+        """Return the class flags for an array of packed BGRA uint32 pixels."""
+        return self.lut[packed & 0xFFFFFF]
+
+    def label_value(self, packed):
+        """Return the class flags for one packed BGRA uint32 pixel value."""
+        return self._lut_view[packed & 0xFFFFFF]
+
+    def count(self, pixels, mask=None):
+        """Return ColorCounts for a BGRA view, optionally only where mask is True."""
+        profiler = get_profiler()
+        lap = profiler.begin()
+        labels = self.label(pixels)
+        lap = profiler.lap("convert", lap)
+        if mask is not None:
+            labels = labels[mask]
+        counts = np.bincount(labels.ravel(), minlength=16)
+        profiler.lap("count", lap)
+        return ColorCounts(
+            red=int(counts[self._red_slots].sum()),
+            green=int(counts[self._green_slots].sum()),
+            blue=int(counts[self._blue_slots].sum()),
+            dark=int(counts[self._dark_slots].sum()),
+            empty=int(counts[self._empty_slots].sum()),
+            total=int(labels.size),
+        )
+
+
+def get_color_classifier():
+    """Return the current settings' classifier (rebuilt only when COLOR_TIGHTENING changes)."""
+    return get_settings().classifier
+
+
+def probe_columns(width, count=PROBE_COLUMNS):
+    """Return up to `count` evenly spaced interior column indices for a region."""
+    positions = np.linspace(0, width - 1, num=min(count, width) + 2)[1:-1]
+    return np.unique(positions.round().astype(np.intp))
+
+def probe_fill(pixels, flags, from_bottom=True, classifier=None):
+    """
+    Sparse fill estimate: for a few columns, binary search the row where pixels
+    stop/start carrying `flags`, assuming the matching pixels form one run
+    anchored at the bottom (from_bottom=True) or at the top. Reads
+    O(log h) pixels per column instead of all w*h.
+
+    Returns (fill%, labels) where labels are the class flags sampled halfway
+    into the matching run of each column (for e.g. poison detection).
+    """
+    classifier = classifier or get_color_classifier()
+    h, w = pixels.shape[:2]
+    packed = pixels.view(np.uint32)[..., 0]
+    # A handful of scalar lookups is far cheaper than numpy calls on tiny arrays
+    label_of = classifier.label_value
+    boundaries = []
+    labels = []
+    for col in probe_columns(w).tolist():
+        # First row where the monotone predicate turns true
+        lo, hi = 0, h
+        while lo < hi:
+            mid = (lo + hi) // 2
+            matches = (label_of(packed.item(mid, col)) & flags) != 0
+            if matches == from_bottom:
+                hi = mid
+            else:
+                lo = mid + 1
+        boundaries.append(lo)
+        sample_row = min((lo + h) // 2, h - 1) if from_bottom else lo // 2
+        labels.append(label_of(packed.item(sample_row, col)))
+
+    boundaries.sort()
+    boundary = boundaries[len(boundaries) // 2]
+    matched = (h - boundary) if from_bottom else boundary
+    return (matched / h) * 100, labels
+
+
+# ------------------------------------------------------------------------------
+# Orb geometry (circular mask + pixel-count -> liquid-level table)
+# ------------------------------------------------------------------------------
+class OrbGeometry:
+    """
+    The ellipse inscribed in a w x h region. `mask` selects the pixels inside
+    the orb; `level_table[n]` is the liquid level (% of orb height) at which
+    n orb pixels are filled from the bottom. Both are built once per size so
+    a tick only does a masked count and one table lookup.
+    """
+    def __init__(self, w, h):
+        yy, xx = np.ogrid[:h, :w]
+        cy, cx = (h - 1) / 2, (w - 1) / 2
+        self.mask = ((yy - cy) / (h / 2)) ** 2 + ((xx - cx) / (w / 2)) ** 2 <= 1.0
+        self.area = int(self.mask.sum())
+
+        # Pixels filled once the liquid reaches each row boundary (from the
+        # bottom), interpolated linearly within a row
+        row_pixels = self.mask.sum(axis=1)[::-1]
+        filled = np.concatenate(([0], np.cumsum(row_pixels)))
+        levels = np.linspace(0, 100, h + 1)
+        self.level_table = np.interp(np.arange(self.area + 1), filled, levels)
+        self.level_table[0] = 0.0  # empty rows at the very bottom would read > 0
+
+    def level(self, count):
+        """Return the liquid level % for `count` filled orb pixels."""
+        return float(self.level_table[min(count, self.area)])
+
+
+@lru_cache(maxsize=8)
+def get_orb_geometry(w, h):
+    """Return the cached OrbGeometry for a region size."""
+    return OrbGeometry(w, h)
+
+def _region_geometry(orb, pixels):
+    """Return the OrbGeometry for pixels if the region uses the orb shape."""
+    if not orb:
+        return None
+    h, w = pixels.shape[:2]
+    return get_orb_geometry(w, h)
+
+def _fill_from_count(count, counts, geometry):
+    """Fill % for `count` matching pixels: raw ratio, or orb level if shaped."""
+    if geometry is not None:
+        return geometry.level(count)
+    return (count / counts.total) * 100
+
+
+# ------------------------------------------------------------------------------
+# HP/MP Fill detection (Modified for Poisoned/Green Health)
+# ------------------------------------------------------------------------------
+class DetectionState:
+    """What the last HP read saw besides the fill level (runtime state, never saved)."""
+    __slots__ = ("poisoned",)
+
+    def __init__(self):
+        self.poisoned = False
+
+
+DETECTION = DetectionState()
+
+def _region_pixels(region, frame):
+    """Return the BGRA pixels for region, from frame if given, else a fresh grab."""
+    if frame is None:
+        frame = ScreenCapture().grab([region])
+    return frame.view(region) if frame is not None else None
+
+def get_health_fill_percentage(region, frame=None):
+    """Return HP fill% from the region. 0 if region is invalid or not found."""
+    if not region or len(region) != 4:
+        return 0
+    pixels = _region_pixels(region, frame)
+    if pixels is None or pixels.size == 0:
+        return 0
+
+    settings = get_settings()
+    use_gray = settings.use_gray
+    if settings.hp_probe:
+        if use_gray:
+            # Dark = empty part of the bar, which sits on top
+            return probe_fill(pixels, CLASS_DARK, from_bottom=False, classifier=settings.classifier)[0]
+        fill, labels = probe_fill(pixels, CLASS_RED | CLASS_GREEN, classifier=settings.classifier)
+        green = sum(1 for label in labels if label & CLASS_GREEN)
+        red = sum(1 for label in labels if label & CLASS_RED)
+        DETECTION.poisoned = green > red
+        return fill
+
+    # Probe mode already measures level along columns; the orb shape only
+    # affects full counts
+    geometry = _region_geometry(settings.hp_orb, pixels)
+    counts = settings.classifier.count(pixels, geometry.mask if geometry else None)
+    if not counts.total:
+        return 0
+
+    if use_gray:
+        # The dark (empty) part sits on top; the orb is symmetric so the same
+        # table maps it to a level measured from the top
+        return _fill_from_count(counts.dark, counts, geometry)
+    else:
+        # Red = normal health, green = poisoned health
+        red_fill = _fill_from_count(counts.red, counts, geometry)
+        green_fill = _fill_from_count(counts.green, counts, geometry)
+
+        # Determine if the health bar is poisoned (green dominates)
+        is_poisoned = counts.green > counts.red
+        DETECTION.poisoned = is_poisoned  # Save state to use in the monitor loop
+
+        # Return fill percentage from the dominant color
+        return green_fill if is_poisoned else red_fill
+
+def get_mana_fill_percentage(region, frame=None):
+    """Return MP fill% from the region. 0 if region is invalid or not found."""
+    if not region or len(region) != 4:
+        return 0
+    pixels = _region_pixels(region, frame)
+    if pixels is None or pixels.size == 0:
+        return 0
+
+    settings = get_settings()
+    use_gray = settings.use_gray
+    if settings.mp_probe:
+        if use_gray:
+            return probe_fill(pixels, CLASS_DARK, from_bottom=False, classifier=settings.classifier)[0]
+        return probe_fill(pixels, CLASS_BLUE, classifier=settings.classifier)[0]
+
+    geometry = _region_geometry(settings.mp_orb, pixels)
+    counts = settings.classifier.count(pixels, geometry.mask if geometry else None)
+    if not counts.total:
+        return 0
+
+    if use_gray:
+        return _fill_from_count(counts.dark, counts, geometry)
+    else:
+        return _fill_from_count(counts.blue, counts, geometry)
+
+
+# ------------------------------------------------------------------------------
+# Flask charges (flask.png silhouette as the slot mask)
+# ------------------------------------------------------------------------------
+@lru_cache(maxsize=None)
+def flask_interior():
+    """Boolean mask of the inside of the flask outline in flask.png, or None if missing."""
+    image = cv2.imread(os.path.join(SCRIPT_DIR, FLASK_ASSET), cv2.IMREAD_UNCHANGED)
+    if image is None:
+        return None
+    # The outline is the dark opaque ink; the inside may be transparent or white
+    gray = image if image.ndim == 2 else cv2.cvtColor(image[..., :3], cv2.COLOR_BGR2GRAY)
+    outline = gray < 128
+    if image.ndim == 3 and image.shape[2] == 4:
+        outline &= image[..., 3] >= 128
+    clear = ~outline
+    # Clear pixels connected to the border are outside the flask; pad so the
+    # flood reaches all of them even where the outline touches an edge
+    clear = np.pad(clear.astype(np.uint8), 1, constant_values=1)
+    h, w = clear.shape
+    cv2.floodFill(clear, np.zeros((h + 2, w + 2), np.uint8), (0, 0), 2)
+    return clear[1:-1, 1:-1] == 1
+
+@lru_cache(maxsize=8)
+def flask_slot_mask(w, h):
+    """The flask interior scaled to a w x h slot (the whole slot without the asset)."""
+    interior = flask_interior()
+    if interior is None:
+        return np.ones((h, w), bool)
+    scaled = cv2.resize(interior.astype(np.uint8) * 255, (w, h), interpolation=cv2.INTER_AREA)
+    return scaled >= 128
+
+
+class FlaskSlots:
+    """
+    Every flask slot's mask as pixel coordinates inside the slots' bounding
+    box, built once per slot layout. read() gathers the masked pixels of all
+    slots with one fancy index, labels them with one table lookup and counts
+    liquid per slot with one bincount over (slot, class) bins.
+    """
+    def __init__(self, slots):
+        self.keys = tuple(key for key, _ in slots)
+        self.bbox = regions_bbox([region for _, region in slots])
+        left, top = self.bbox[:2]
+        rows, cols, bins = [], [], []
+        for i, (_, (x, y, w, h)) in enumerate(slots):
+            yy, xx = np.nonzero(flask_slot_mask(w, h))
+            rows.append(yy + (y - top))
+            cols.append(xx + (x - left))
+            bins.append(np.full(yy.size, i * 16, np.intp))
+        self.rows = np.concatenate(rows)
+        self.cols = np.concatenate(cols)
+        self.bins = np.concatenate(bins)
+        self.area = np.maximum(np.bincount(self.bins // 16, minlength=len(self.keys)), 1)
+        self.liquid = (np.arange(16) & (CLASS_RED | CLASS_GREEN | CLASS_BLUE)) != 0
+
+    def read(self, frame, classifier):
+        """Return {key: charge %} for every slot, or {} if the slots are outside the frame."""
+        pixels = frame.view(self.bbox)
+        if pixels is None:
+            return {}
+        labels = classifier.label_packed(pixels.view(np.uint32)[..., 0][self.rows, self.cols])
+        counts = np.bincount(self.bins + labels, minlength=len(self.keys) * 16)
+        filled = counts.reshape(-1, 16)[:, self.liquid].sum(axis=1)
+        return dict(zip(self.keys, (filled * 100.0 / self.area).tolist()))
+
+
+@lru_cache(maxsize=8)
+def get_flask_slots(slots):
+    """Return the cached FlaskSlots for a ((key, region), ...) layout."""
+    return FlaskSlots(slots)
+
+def read_flask_charges(frame, settings=None):
+    """Charge % of each configured flask slot in `frame`, keyed by potion key."""
+    settings = settings or get_settings()
+    if not settings.flask_slots:
+        return {}
+    return get_flask_slots(settings.flask_slots).read(frame, settings.classifier)
+
+
+# ------------------------------------------------------------------------------
+# Dirty-region skipping
+# ------------------------------------------------------------------------------
+def region_fingerprint(pixels):
+    """Cheap strided checksum of a BGRA region view."""
+    return zlib.crc32(pixels[:, ::FINGERPRINT_COLUMN_STRIDE].tobytes())
+
+
+class FillCache:
+    """
+    Remembers each region's fingerprint and last fill value. When a tick
+    sees the same pixels (and the same detection settings) the previous
+    value is returned without running the color pipeline again.
+    """
+    def __init__(self):
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def read(self, name, region, frame, reader):
+        """Return reader(region, frame), reusing the last value if nothing changed."""
+        settings = get_settings()
+        if not settings.skip_unchanged:
+            return reader(region, frame)
+        pixels = frame.view(region)
+        if pixels is None or pixels.size == 0:
+            return reader(region, frame)
+
+        key = (region_fingerprint(pixels), region, settings.detection_key)
+        entry = self.entries.get(name)
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        value = reader(region, frame)
+        self.entries[name] = (key, value)
+        return value
+
+    def skip_rate(self):
+        """Fraction of reads answered from the cache so far."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def reset(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+# ------------------------------------------------------------------------------
+# Detector process (shared-memory ring buffer of fill results)
+# ------------------------------------------------------------------------------
+@lru_cache(maxsize=None)
+def fill_slot_dtype():
+    """Record layout of one ring slot (built on first use: numpy is lazy)."""
+    return np.dtype([("seq", "<u8"), ("time", "<f8"), ("hp", "<f4"),
+                     ("mp", "<f4"), ("poisoned", "u1"),
+                     ("flasks", "<f4", (len(FLASK_KEYS),))], align=True)
+
+FillSample = namedtuple("FillSample", "seq time hp mp poisoned flasks")
+
+
+class FillRing:
+    """
+    Single-writer ring of FillSample slots in shared memory. The header holds
+    the newest sequence number; each slot repeats its own sequence number,
+    which the writer zeroes while filling it in, so a reader that raced an
+    overwrite sees a mismatch and retries (a seqlock per slot).
+    """
+    HEADER = 8  # uint64 newest sequence number
+
+    def __init__(self, name=None, slots=DETECT_RING_SLOTS):
+        size = self.HEADER + slots * fill_slot_dtype().itemsize
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            self.owner = True
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+        self.name = self.shm.name
+        self.slots = slots
+        self.header = np.ndarray((1,), np.uint64, self.shm.buf, 0)
+        self.ring = np.ndarray((slots,), fill_slot_dtype(), self.shm.buf, self.HEADER)
+        if self.owner:
+            self.header[0] = 0
+            self.ring["seq"] = 0
+        self.next_seq = int(self.header[0]) + 1
+
+    def write(self, t, hp, mp, poisoned, flasks=None):
+        """Publish one sample; `flasks` maps FLASK_KEYS to charge % (NaN = not read)."""
+        seq = self.next_seq
+        slot = self.ring[seq % self.slots]
+        slot["seq"] = 0
+        slot["time"] = t
+        slot["hp"] = hp
+        slot["mp"] = mp
+        slot["poisoned"] = poisoned
+        flasks = flasks or {}
+        slot["flasks"] = [flasks.get(key, np.nan) for key in FLASK_KEYS]
+        slot["seq"] = seq
+        self.header[0] = seq
+        self.next_seq = seq + 1
+
+    def _read(self, seq):
+        slot = self.ring[seq % self.slots].copy()
+        if int(slot["seq"]) != seq or int(self.ring[seq % self.slots]["seq"]) != seq:
+            return None
+        flasks = {key: charge for key, charge in zip(FLASK_KEYS, slot["flasks"].tolist())
+                  if charge == charge}  # NaN: slot not read
+        return FillSample(seq, float(slot["time"]), float(slot["hp"]),
+                          float(slot["mp"]), bool(slot["poisoned"]), flasks)
+
+    def latest(self):
+        """Newest FillSample, or None before the first write."""
+        for _ in range(3):
+            seq = int(self.header[0])
+            if seq == 0:
+                return None
+            sample = self._read(seq)
+            if sample is not None:
+                return sample
+        return None
+
+    def since(self, seq):
+        """Every sample newer than `seq` still in the ring, oldest first."""
+        newest = int(self.header[0])
+        first = max(seq + 1, newest - self.slots + 1, 1)
+        samples = (self._read(s) for s in range(first, newest + 1))
+        return [sample for sample in samples if sample is not None]
+
+    def close(self):
+        del self.header, self.ring
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def run_detector(ring_name, config, updates, stop, rate):
+    """
+    Detector loop (child process, or a thread in benchmarks): grab the
+    regions, read HP/MP and flask charges and publish them `rate` times per second until
+    `stop` is set. New CONFIG dicts arrive on the `updates` queue.
+    """
+    CONFIG.update(config)
+    settings = compile_config()
+    settings.classifier  # build the color table before the first sample
+    ring = FillRing(ring_name)
+    capture = create_capture_backend()
+    fill_cache = FillCache()
+    interval = 1.0 / rate
+    deadline = time.perf_counter()
+    try:
+        while not stop.is_set():
+            try:
+                while True:
+                    CONFIG.update(updates.get_nowait())
+                    settings = compile_config()
+            except queue.Empty:
+                pass
+            frame = capture.grab(settings.capture_regions)
+            t = time.perf_counter()
+            if frame is None:
+                hp = mp = 0.0
+                flasks = None
+            else:
+                hp = fill_cache.read("HP", settings.hp_region, frame, get_health_fill_percentage)
+                mp = fill_cache.read("MP", settings.mp_region, frame, get_mana_fill_percentage)
+                flasks = read_flask_charges(frame, settings)
+            ring.write(t, hp, mp, DETECTION.poisoned, flasks)
+
+            deadline += interval
+            delay = deadline - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                deadline = time.perf_counter()  # fell behind: don't try to catch up
+    finally:
+        capture.close()
+        ring.close()
+
+
+class DetectorProcess:
+    """Owns the ring buffer and the child process running run_detector()."""
+    def __init__(self, rate=None):
+        self.rate = rate or get_settings().max_tick_rate
+        self.ring = FillRing()
+        self.updates = multiprocessing.Queue()
+        self.stop_event = multiprocessing.Event()
+        self.process = multiprocessing.Process(
+            target=run_detector,
+            args=(self.ring.name, session_config(), self.updates, self.stop_event, self.rate),
+            daemon=True,
+        )
+        self.process.start()
+
+    def latest(self):
+        return self.ring.latest()
+
+    def update_config(self, config):
+        self.updates.put(dict(config))
+
+    def stop(self):
+        self.stop_event.set()
+        self.process.join(timeout=2.0)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.ring.close()
+
+
+# ------------------------------------------------------------------------------
+# Adaptive tick scheduler
+# ------------------------------------------------------------------------------
+class TickScheduler:
+    """
+    Decides how long the monitor loop waits before the next tick.
+
+    - idle(): paused, window missing/unfocused or loading -> back off,
+      doubling the interval up to 1 / min_rate.
+    - active(hp, trigger): HP falling fast or within NEAR_THRESHOLD_MARGIN of
+      the highest trigger -> 1 / max_rate, otherwise MONITOR_SLEEP_TIME.
+
+    wait() sleeps for the rest of the interval (processing time included)
+    and keeps a smoothed measurement of the effective tick rate.
+    """
+    def __init__(self, min_rate=DEFAULT_MIN_TICK_RATE, max_rate=DEFAULT_MAX_TICK_RATE,
+                 clock=SYSTEM_CLOCK):
+        self.clock = clock
+        self.configure(min_rate, max_rate)
+        self.interval = MONITOR_SLEEP_TIME
+        self.tick_start = clock.now()
+        self.avg_period = None
+        self.last_hp = None
+        self.last_hp_time = None
+
+    def configure(self, min_rate, max_rate):
+        min_rate = max(0.1, float(min_rate))
+        max_rate = max(min_rate, float(max_rate))
+        self.max_interval = 1.0 / min_rate
+        self.min_interval = 1.0 / max_rate
+        self.base_interval = min(max(MONITOR_SLEEP_TIME, self.min_interval), self.max_interval)
+
+    def idle(self):
+        """Nothing to watch right now: back off towards the slowest rate."""
+        self.interval = min(max(self.interval, self.base_interval) * 2, self.max_interval)
+        self.last_hp = None
+
+    def active(self, hp_fill, trigger):
+        """Pick the next interval from HP trend and distance to `trigger`."""
+        now = self.clock.now()
+        falling_fast = False
+        if self.last_hp is not None and now > self.last_hp_time:
+            slope = (hp_fill - self.last_hp) / (now - self.last_hp_time)
+            falling_fast = slope <= -FAST_DROP_RATE
+        self.last_hp = hp_fill
+        self.last_hp_time = now
+
+        if falling_fast or hp_fill - trigger < NEAR_THRESHOLD_MARGIN:
+            self.interval = self.min_interval
+        else:
+            self.interval = self.base_interval
+
+    async def wait(self, wake=None):
+        """
+        Await the end of the current tick's interval. Ticks are laid out
+        from tick_start on the clock, so time spent working in the tick
+        comes off the wait. Setting the asyncio.Event `wake` ends it early.
+        """
+        remaining = self.interval - (self.clock.now() - self.tick_start)
+        if remaining > 0:
+            await self.clock.wait(remaining, wake)
+        now = self.clock.now()
+        period = now - self.tick_start
+        self.tick_start = now
+        if self.avg_period is None:
+            self.avg_period = period
+        else:
+            self.avg_period += 0.2 * (period - self.avg_period)
+
+    def tick_rate(self):
+        """Smoothed ticks per second actually achieved."""
+        return 1.0 / self.avg_period if self.avg_period else 0.0
+
+
+# ------------------------------------------------------------------------------
+# Potion action dispatcher
+# ------------------------------------------------------------------------------
+class ActionDispatcher:
+    """
+    Sends potion key presses from the engine's dispatch task so the sampling
+    task never waits on them. Every resource ("Health", "Mana") has its own
+    cooldown, kept as the timestamp from which it may be pressed again, so
+    a mana press never delays a health press and vice versa. Outside a
+    running dispatch task presses happen inline.
+    """
+    def __init__(self, press=None, clock=SYSTEM_CLOCK):
+        self.press = press or PyAutoGuiInput().press
+        self.clock = clock
+        self.ready_at = {}
+        self.actions = None  # asyncio.Queue while run() is active
+
+    def request(self, resource, key, cooldown, now=None, seen_at=None):
+        """
+        Queue a press of `key` unless `resource` is cooling down. Returns True
+        if queued. `seen_at` is the perf_counter time of the frame that asked
+        for the press; the profiler's "reaction" stage measures from it.
+        """
+        now = self.clock.now() if now is None else now
+        if now < self.ready_at.get(resource, 0.0):
+            return False
+        self.ready_at[resource] = now + cooldown
+        if self.actions is None:
+            self._send(key, seen_at)
+        else:
+            self.actions.put_nowait((key, seen_at))
+        return True
+
+    def cooling_down(self, resource, now=None):
+        now = self.clock.now() if now is None else now
+        return now < self.ready_at.get(resource, 0.0)
+
+    def reset_cooldown(self, resource):
+        """Allow `resource` to be pressed again immediately."""
+        self.ready_at.pop(resource, None)
+
+    async def run(self):
+        """Dispatch task: send queued presses until cancelled."""
+        self.actions = asyncio.Queue()
+        try:
+            while True:
+                self._send(*await self.actions.get())
+        finally:
+            self.actions = None
+
+    def _send(self, key, seen_at):
+        self.press(key)
+        if seen_at is not None:
+            get_profiler().record("reaction", self.clock.now() - seen_at)
+
+
+# ------------------------------------------------------------------------------
+# HP trend prediction
+# ------------------------------------------------------------------------------
+class HpTrend:
+    """
+    Fixed-size ring buffer of recent (time, fill) samples with a least-squares
+    slope over the last TREND_WINDOW seconds. Only falling trends are
+    extrapolated: a rising bar never delays a potion. A burst that already
+    stopped keeps the fitted slope steep for the whole window, so falling()
+    tells whether the drop is still going on.
+    """
+    def __init__(self, size=TREND_SAMPLES, window=TREND_WINDOW):
+        self.size = size
+        self.window = window
+        self.times = [0.0] * size
+        self.fills = [0.0] * size
+        self.reset()
+
+    def reset(self):
+        self.index = 0
+        self.count = 0
+
+    def add(self, fill, now):
+        self.times[self.index] = now
+        self.fills[self.index] = fill
+        self.index = (self.index + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+
+    def latest(self):
+        return self.fills[self.index - 1] if self.count else 0.0
+
+    def slope(self):
+        """Fill change in %/s over the recent window (0 with fewer than 3 samples)."""
+        if self.count < 3:
+            return 0.0
+        newest = self.times[self.index - 1]
+        ts, fs = [], []
+        for i in range(1, self.count + 1):
+            t = self.times[self.index - i]
+            if newest - t > self.window:
+                break
+            ts.append(t - newest)
+            fs.append(self.fills[self.index - i])
+        n = len(ts)
+        if n < 3:
+            return 0.0
+        mean_t = sum(ts) / n
+        mean_f = sum(fs) / n
+        var = sum((t - mean_t) ** 2 for t in ts)
+        if var <= 0:
+            return 0.0
+        return sum((t - mean_t) * (f - mean_f) for t, f in zip(ts, fs)) / var
+
+    def falling(self, samples=TREND_FALLING_SAMPLES):
+        """True if each of the last `samples` steps dropped (a repeated frame does not count)."""
+        if self.count <= samples:
+            return False
+        fills = [self.fills[self.index - i] for i in range(samples + 1, 0, -1)]
+        return all(b < a for a, b in zip(fills, fills[1:]))
+
+    def project(self, horizon):
+        """Expected fill `horizon` seconds after the newest sample."""
+        return self.latest() + min(self.slope(), 0.0) * horizon
+
+    def time_to_zero(self):
+        """Seconds until the bar empties at the current rate (inf when not falling)."""
+        slope = self.slope()
+        if slope >= 0:
+            return float("inf")
+        return self.latest() / -slope
+
+
+# ------------------------------------------------------------------------------
+# Potion verification
+# ------------------------------------------------------------------------------
+class PotionVerifier:
+    """
+    Watches one resource's fill after a press to tell whether the flask fired.
+
+    idle -> pressed() -> "pending": the fill must climb VERIFY_MIN_RISE above
+    its lowest post-press value within `window` seconds ("confirmed", with
+    the press-to-effect latency) or the press counts as dropped ("missed").
+    Once confirmed the verifier is "recovering" until the fill stops rising
+    for RECOVERY_STALL_TIME, falls back below its peak (damage outpacing the
+    flask) or RECOVERY_MAX_TIME passes ("recovered"). While pending or
+    recovering, further presses of this resource are redundant.
+    """
+    IDLE = "idle"
+    PENDING = "pending"
+    RECOVERING = "recovering"
+
+    def __init__(self, window=DEFAULT_POTION_VERIFY_WINDOW):
+        self.window = window
+        self.state = self.IDLE
+        self.press_time = None
+        self.low = None
+        self.peak = None
+        self.last_rise_time = None
+        self.recovery_start = None
+        self.latencies = deque(maxlen=VERIFY_LATENCY_SAMPLES)  # most recent press-to-effect times
+
+    def pressed(self, fill, now):
+        self.state = self.PENDING
+        self.press_time = now
+        self.low = fill
+
+    def suppressing(self):
+        return self.state != self.IDLE
+
+    def update(self, fill, now):
+        """Feed the latest fill; returns "confirmed", "missed", "recovered" or None."""
+        if self.state == self.PENDING:
+            self.low = min(self.low, fill)
+            if fill >= self.low + VERIFY_MIN_RISE:
+                self.state = self.RECOVERING
+                self.peak = fill
+                self.last_rise_time = now
+                self.recovery_start = now
+                self.latencies.append(now - self.press_time)
+                return "confirmed"
+            if now - self.press_time > self.window:
+                self.state = self.IDLE
+                return "missed"
+        elif self.state == self.RECOVERING:
+            if fill > self.peak:
+                self.peak = fill
+                self.last_rise_time = now
+            elif (fill < self.peak - VERIFY_MIN_RISE
+                  or now - self.last_rise_time > RECOVERY_STALL_TIME
+                  or now - self.recovery_start > RECOVERY_MAX_TIME):
+                self.state = self.IDLE
+                return "recovered"
+        return None
+
+    def last_latency(self):
+        return self.latencies[-1] if self.latencies else None
+
+    def reset(self):
+        self.state = self.IDLE
+
+
+# ------------------------------------------------------------------------------
+# Log sink
+# ------------------------------------------------------------------------------
+class LogSink:
+    """
+    Non-blocking log fan-out. log() only appends to a bounded ring buffer
+    (drained by the UI in batches) and enqueues a record for a QueueListener
+    thread, which writes the rotating log file and echoes to stdout.
+    """
+    def __init__(self, path=LOG_FILE):
+        self.pending = deque(maxlen=LOG_BUFFER_SIZE)
+        records = queue.Queue()
+        self.queue_handler = QueueHandler(records)
+
+        file_handler = RotatingFileHandler(path, maxBytes=LOG_FILE_MAX_BYTES,
+                                           backupCount=LOG_FILE_BACKUPS, encoding="utf-8")
+        file_handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        console_handler = logging.StreamHandler(sys.stdout)
+        self.listener = QueueListener(records, file_handler, console_handler)
+        self.listener.start()
+
+    def log(self, msg):
+        self.pending.append(msg)
+        self.queue_handler.handle(logging.makeLogRecord(
+            {"msg": msg, "levelno": logging.INFO, "levelname": "INFO"}))
+
+    def drain(self):
+        """Return and remove every line waiting for the widget."""
+        lines = []
+        while self.pending:
+            lines.append(self.pending.popleft())
+        return lines
+
+    def close(self):
+        """Flush outstanding records and stop the writer thread."""
+        self.listener.stop()
+
+
+# ------------------------------------------------------------------------------
+# Monitor engine (no GUI; platform pieces are injected)
+# ------------------------------------------------------------------------------
+class MonitorEngine:
+    """
+    The potion/chicken runtime without any Tk. Everything outside the process
+    is injected: the window tracker, capture backend, input backend
+    (press/click) and clock (now/sleep/wait). The same code therefore runs
+    against the game or against simulate.py's virtual world.
+
+    run() drives an asyncio loop of separate, cancellable tasks: "sample"
+    (capture, decide, one tick at a time), "dispatch" (potion presses),
+    and "chicken" and "reconnect" while a chicken is in progress. All of
+    them time themselves on the same clock. stop() and set_paused() may
+    be called from any thread and take effect within one tick.
+
+    Settings come from the current ConfigSnapshot, taken once per tick;
+    config.json edits made on disk are picked up every CONFIG_RELOAD_INTERVAL
+    and handed to `post_config(config, snapshot)`, which must install them
+    on the thread that owns CONFIG (by default the engine's own thread).
+    Settings the engine learns itself, such as the exit button position,
+    go through `post_setting(key, value)` the same way.
+    `log(msg)` receives log lines and `publish(**state)` receives UI state
+    (hp_fill, mp_fill, hp_random, mp_random, status, overlay).
+    """
+    def __init__(self, window, capture, input_backend=None, clock=SYSTEM_CLOCK,
+                 log=print, publish=None, exit_locator=None, post_config=None,
+                 post_setting=None):
+        self.window = window
+        self.capture = capture
+        self.input = input_backend or PyAutoGuiInput()
+        self.clock = clock
+        self.log_message = log
+        self.publish = publish or (lambda **state: None)
+        self.post_config = post_config or self.install_reloaded_config
+        self.post_setting = post_setting or self.store_setting
+
+        self.monitoring = False
+        self.paused = False
+        self.current_random_hp_threshold = None
+        self.current_random_mp_threshold = None
+        self.last_random_update = None
+        self.frame_time = None
+
+        self.fill_cache = FillCache()
+        self.dispatcher = ActionDispatcher(self.input.press, clock)
+        self.verifiers = {
+            "Health": PotionVerifier(),
+            "Mana": PotionVerifier(),
+        }
+        settings = get_settings()
+        self.scheduler = TickScheduler(settings.min_tick_rate, settings.max_tick_rate, clock)
+        self.profiler = get_profiler()
+        self.exit_locator = exit_locator or ExitButtonLocator(
+            create_capture_backend(), clock,
+            on_learned=lambda positions: self.post_setting("EXIT_BUTTON_POSITIONS", positions))
+        self.chicken_latency = LatencyStats(CHICKEN_LATENCY_SAMPLES)
+        self.hp_trend = HpTrend()
+        self.lead_times = LatencyStats(LEAD_SAMPLES)
+        self.early_presses = 0
+        self.detector = None
+        self.next_reload_check = 0.0
+        self.flask_charges = {}     # potion key -> charge % seen this tick
+        self.empty_flasks = set()   # keys whose press is being skipped
+        self.skipped_presses = 0
+        self.skip_counted_until = {}
+        self.settings = get_settings()  # the snapshot the current tick runs on
+
+        self.loop = None    # the running event loop, while run() is active
+        self.tasks = []
+        self.wake = None    # asyncio.Event cutting the current tick's wait short
+
+    def start(self):
+        """Reset per-session state and mark the engine as monitoring (call run() next)."""
+        settings = get_settings()
+        self.fill_cache.reset()
+        for verifier in self.verifiers.values():
+            verifier.reset()
+            verifier.window = settings.verify_window
+        self.scheduler = TickScheduler(settings.min_tick_rate, settings.max_tick_rate, self.clock)
+        self.last_random_update = None
+        self.hp_trend.reset()
+        self.flask_charges = {}
+        self.empty_flasks.clear()
+        self.skipped_presses = 0
+        self.skip_counted_until.clear()
+        self.monitoring = True
+
+    def apply_settings(self):
+        """Push a newly compiled snapshot into the scheduler, verifiers and detector."""
+        settings = get_settings()
+        self.scheduler.configure(settings.min_tick_rate, settings.max_tick_rate)
+        for verifier in self.verifiers.values():
+            verifier.window = settings.verify_window
+        if self.detector is not None:
+            self.detector.update_config(session_config())
+
+    def reload_if_changed(self):
+        """Hot reload config.json if it was edited on disk (checked once per interval)."""
+        now = self.clock.now()
+        if now < self.next_reload_check:
+            return
+        self.next_reload_check = now + CONFIG_RELOAD_INTERVAL
+        reloaded = read_changed_config()
+        if reloaded is not None:
+            self.post_config(*reloaded)
+
+    def install_reloaded_config(self, config, settings):
+        """Install a config re-read from disk and apply it (thread owning CONFIG only)."""
+        install_config(config, settings)
+        self.apply_settings()
+        self.log_message(f"{os.path.basename(CONFIG_FILE)} changed on disk, settings reloaded.")
+
+    def store_setting(self, key, value):
+        """Set one CONFIG key and save config.json (thread owning CONFIG only)."""
+        CONFIG[key] = value
+        save_config()
+
+    def stop(self):
+        """Cancel every task; run() returns right after. Safe from any thread."""
+        self.monitoring = False
+        self._call_in_loop(self._cancel_tasks)
+
+    def set_paused(self, paused):
+        """Pause or resume at the start of the next tick. Safe from any thread."""
+        self.paused = paused
+        self._call_in_loop(self._wake_up)
+
+    def _call_in_loop(self, callback):
+        loop = self.loop
+        if loop is None:
+            return
+        try:
+            loop.call_soon_threadsafe(callback)
+        except RuntimeError:
+            pass  # the loop closed in between: nothing left to stop
+
+    def _cancel_tasks(self):
+        for task in self.tasks:
+            task.cancel()
+
+    def _wake_up(self):
+        if self.wake is not None:
+            self.wake.set()
+
+    def run(self):
+        """Run the engine's event loop in the calling thread until stop()."""
+        asyncio.run(self.run_async())
+
+    async def run_async(self):
+        # Decode the templates and the flask mask and build the color table now,
+        # so the hot path never touches disk or waits on a table build
+        get_template_store().preload()
+        flask_interior()
+        get_settings().classifier
+        # The loop, the task list and the detector belong to this run: teardown
+        # only clears the engine's references if a newer run has not replaced them
+        loop = self.loop = asyncio.get_running_loop()
+        self.wake = asyncio.Event()
+        detector = None
+        if get_settings().detect_process:
+            detector = self.detector = DetectorProcess()
+            self.log_message(f"Detector process started (pid {detector.process.pid}).")
+        tasks = self.tasks = [asyncio.create_task(self.dispatcher.run(), name="dispatch"),
+                              asyncio.create_task(self.sample(), name="sample")]
+        try:
+            await tasks[-1]
+        except asyncio.CancelledError:
+            pass
+        finally:
+            if self.loop is loop:
+                self.loop = None
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if self.tasks is tasks:
+                self.tasks = []
+            if detector is not None:
+                if self.detector is detector:
+                    self.detector = None
+                detector.stop()
+            self.log_message("Exited monitor loop.")
+
+    async def spawn(self, coro, name):
+        """Run `coro` as its own cancellable task and wait for it."""
+        task = asyncio.create_task(coro, name=name)
+        self.tasks.append(task)
+        try:
+            return await task
+        finally:
+            self.tasks.remove(task)
+
+    async def idle(self, status):
+        self.publish(status=status)
+        self.scheduler.idle()
+        await self.scheduler.wait(self.wake)
+
+    async def sample(self):
+        """
+        The sampling task, one tick per pass while self.monitoring = True.
+        We do NOT stop on chicken; instead we:
+         1) Run the chicken task,
+         2) Run the reconnect task (load screen, then HP >= 50%),
+         3) Resume normal potion usage,
+         4) Keep monitoring forever.
+        """
+        profiler = self.profiler
+        while self.monitoring:
+            profiler.tick()
+            self.wake.clear()
+            self.reload_if_changed()
+            settings = self.settings = get_settings()
+            if self.paused:
+                await self.idle("Status: Paused")
+                continue
+
+            # must be in active window (served from the tracker's cache)
+            lap = profiler.begin()
+            if not self.window.find():
+                await self.idle("Status: Game Window Not Found")
+                continue
+            if not self.window.is_focused():
+                await self.idle("Status: Target Window Not Active")
+                continue
+            profiler.lap("window", lap)
+
+            # get HP/MP (capture/convert/count are timed inside)
+            hp_fill, mp_fill = self.read_fills()
+
+            lap = profiler.begin()
+            self.publish(hp_fill=hp_fill, mp_fill=mp_fill)
+
+            # if both basically 0 => might be loading
+            if hp_fill<1 and mp_fill<1:
+                await self.idle("Status: Pause/Loading/Unknown")
+                continue
+
+            self.publish(
+                status=f"Status: Monitoring @ {self.scheduler.tick_rate():.1f} Hz "
+                       f"(skipped {self.fill_cache.skip_rate():.0%} unchanged)")
+            lap = profiler.lap("ui", lap)
+
+            self.verify_potions(hp_fill, mp_fill)
+            predict = settings.predict
+            self.hp_trend.add(hp_fill, self.frame_time)
+
+            # -- Chickening check --
+            if settings.chicken_enabled:
+                c_thr = settings.chicken_threshold
+                # Trend chickens only while HP is still dropping and already near
+                # the threshold: a finished burst must not log out at high HP
+                time_to_zero = float("inf")
+                if predict and hp_fill < c_thr + CHICKEN_TREND_MARGIN and self.hp_trend.falling():
+                    time_to_zero = self.hp_trend.time_to_zero()
+                if hp_fill < c_thr or time_to_zero < CHICKEN_LEAD_TIME:
+                    if hp_fill < c_thr:
+                        self.log_message(f"HP < {c_thr:g} => chickening out!")
+                    else:
+                        self.log_message(f"HP {hp_fill:.0f}% empties in {time_to_zero * 1000:.0f} ms "
+                                         "=> chickening out early!")
+                    # CHANGED: do not break or stop monitoring
+                    await self.spawn(self.chicken(), "chicken")
+                    self.hp_trend.reset()
+                    hp_fill = await self.spawn(self.reconnect(), "reconnect")
+                    if not self.monitoring:
+                        break
+                    self.hp_trend.add(hp_fill, self.frame_time)
+                    lap = profiler.begin()
+
+            # random thresholds
+            hp_l, hp_u = settings.hp_lower, settings.hp_upper
+            mp_l, mp_u = settings.mp_lower, settings.mp_upper
+            now = self.clock.now()
+            if self.last_random_update is None or now - self.last_random_update >= 0.5:
+                self.current_random_hp_threshold = random.uniform(hp_l, hp_u)
+                self.current_random_mp_threshold = random.uniform(mp_l, mp_u)
+                self.last_random_update = now
+
+                self.publish(hp_random=self.current_random_hp_threshold,
+                             mp_random=self.current_random_mp_threshold)
+
+                if settings.show_overlay:
+                    self.publish(overlay=(self.current_random_hp_threshold,
+                                          self.current_random_mp_threshold))
+
+            # Adjust HP lower threshold if poisoned (green health)
+            hp_lower = hp_l
+            if DETECTION.poisoned:
+                hp_lower = hp_lower * settings.poison_factor
+
+            # potions: compare where HP will be once a press could take effect
+            hp_delay = settings.hp_delay
+            hp_seen = hp_fill
+            if predict:
+                hp_seen = self.hp_trend.project(self.scheduler.interval + PREDICT_LATENCY)
+            hp_trigger = max(hp_lower, self.current_random_hp_threshold)
+            need_hp = hp_seen < hp_trigger
+            if need_hp and hp_fill >= hp_trigger and not self.flask_can_spare("1"):
+                # Only the projection is below the trigger: keep the charge for the real dip
+                need_hp = False
+            mp_lower = mp_l
+            mp_delay = settings.mp_delay
+            need_mp = (mp_fill < mp_lower) or (mp_fill < self.current_random_mp_threshold)
+            lap = profiler.lap("decision", lap)
+
+            if need_hp and self.use_potion("1", hp_fill, "Health", hp_delay):
+                slope = self.hp_trend.slope()
+                if hp_fill >= hp_trigger and slope < 0:
+                    # Fired on the trend alone: time it would have taken to cross
+                    lead = (hp_fill - hp_trigger) / -slope
+                    self.lead_times.add(lead)
+                    self.early_presses += 1
+                    self.log_message(f"Health potion fired {lead * 1000:.0f} ms before "
+                                     f"HP would cross {hp_trigger:.0f}%.")
+            if need_mp:
+                self.use_potion("2", mp_fill, "Mana", mp_delay)
+            profiler.lap("dispatch", lap)
+
+            # Poll faster when HP is dropping or close to any trigger
+            hp_trigger = max(hp_lower, self.current_random_hp_threshold)
+            if settings.chicken_enabled:
+                hp_trigger = max(hp_trigger, settings.chicken_threshold)
+            self.scheduler.active(hp_fill, hp_trigger)
+            await self.scheduler.wait(self.wake)
+
+    def read_fills(self):
+        """
+        Grab one frame covering every region and read HP and MP from it;
+        the flask charges read from the same frame land in flask_charges.
+        """
+        if self.detector is not None:
+            # The child process did the capture and detection already
+            sample = self.detector.latest()
+            if sample is None:
+                self.flask_charges = {}
+                return 0, 0
+            self.frame_time = sample.time
+            DETECTION.poisoned = sample.poisoned
+            self.flask_charges = sample.flasks
+            return sample.hp, sample.mp
+        settings = get_settings()
+        lap = self.profiler.begin()
+        frame = self.capture.grab(settings.capture_regions)
+        self.frame_time = self.clock.now()
+        self.profiler.lap("capture", lap)
+        if frame is None:
+            self.flask_charges = {}
+            return 0, 0
+        self.flask_charges = read_flask_charges(frame, settings)
+        return (self.fill_cache.read("HP", settings.hp_region, frame, get_health_fill_percentage),
+                self.fill_cache.read("MP", settings.mp_region, frame, get_mana_fill_percentage))
+
+    def use_potion(self, key, fill_val, label, delay):
+        """
+        Queue a potion press; `delay` is that potion's cooldown, not a sleep.
+        Returns True if a press was queued. Presses on a flask that reads
+        below one use are skipped (and logged once until it refills).
+        """
+        verify = self.settings.verify_enabled
+        verifier = self.verifiers[label]
+        if verify and verifier.suppressing():
+            return False
+        now = self.clock.now()
+        if self.dispatcher.cooling_down(label, now):
+            return False
+        if not self.flask_has_charge(key, label):
+            # Count at most one skip per cooldown, as many as presses it saved
+            if now >= self.skip_counted_until.get(label, 0.0):
+                self.skipped_presses += 1
+                self.skip_counted_until[label] = now + delay
+            return False
+        if not self.dispatcher.request(label, key, delay, now, seen_at=self.frame_time):
+            return False
+        if verify:
+            verifier.pressed(fill_val, now)
+        self.log_message(f"{label} potion used! (fill={fill_val:.1f}%)")
+        return True
+
+    def flask_has_charge(self, key, label):
+        """False if this tick's frame shows the flask for `key` too empty to use."""
+        charge = self.flask_charges.get(key)
+        if charge is None:  # no slot configured, or nothing read this tick
+            return True
+        if charge >= self.settings.flask_min_charge:
+            if key in self.empty_flasks:
+                self.empty_flasks.discard(key)
+                self.log_message(f"{label} flask has charges again ({charge:.0f}%).")
+            return True
+        if key not in self.empty_flasks:
+            self.empty_flasks.add(key)
+            self.log_message(f"{label} flask is empty ({charge:.0f}%), skipping presses.")
+        return False
+
+    def flask_can_spare(self, key):
+        """True if the flask for `key` reads PREDICT_FLASK_RESERVE above the minimum, or is not read."""
+        charge = self.flask_charges.get(key)
+        return charge is None or charge >= self.settings.flask_min_charge + PREDICT_FLASK_RESERVE
+
+    def verify_potions(self, hp_fill, mp_fill):
+        """Advance both potion verifiers with this tick's fills and act on the result."""
+        if not self.settings.verify_enabled:
+            return
+        now = self.clock.now()
+        for label, fill in (("Health", hp_fill), ("Mana", mp_fill)):
+            verifier = self.verifiers[label]
+            event = verifier.update(fill, now)
+            if event == "confirmed":
+                self.log_message(f"{label} potion took effect after "
+                                 f"{verifier.last_latency() * 1000:.0f} ms.")
+            elif event == "missed":
+                # Nothing happened: let the next tick press again right away
+                self.dispatcher.reset_cooldown(label)
+                self.log_message(f"{label} potion had no effect within "
+                                 f"{verifier.window:.2f}s, retrying.")
+
+    # Chicken flow
+    async def pausable_wait(self, seconds):
+        """clock.wait() that set_paused() cuts short (chicken/reconnect tasks)."""
+        self.wake.clear()
+        await self.clock.wait(seconds, self.wake)
+
+    async def chicken(self):
+        """Chicken task: ESC, find and click "Exit to Log In Screen"."""
+        start = self.clock.now()
+        if self.paused:
+            self.log_message("Paused: chicken cancelled.")
+            return
+        self.log_message("Chickening flow: pressing ESC, searching for exit button.")
+        if self.window.find():
+            try:
+                self.window.bring_to_front()
+            except Exception as e:
+                self.log_message(f"Error setting foreground: {e}")
+
+        self.input.press("esc")
+
+        exit_entry = get_template_store().get(*EXIT_TEMPLATE)
+        if exit_entry is None:
+            self.log_message("ERROR: exit_to_log_in_screen.png not found!")
+        else:
+            # Poll the remembered button patch, then the whole game window
+            btn = await self.exit_locator.locate(self.window.get_rect(), exit_entry, start)
+            if btn and self.paused:
+                self.log_message("Paused: not clicking 'Exit to Log In Screen'.")
+            elif btn:
+                self.input.click(btn[0] + btn[2] // 2, btn[1] + btn[3] // 2)
+                latency = self.clock.now() - start
+                self.chicken_latency.add(latency)
+                self.log_message(f"Clicked 'Exit to Log In Screen' {latency * 1000:.0f} ms "
+                                 f"after trigger ({self.exit_locator.last_path} search). "
+                                 f"Chicken latency {self.chicken_latency.summary()}.")
+            else:
+                self.log_message("Could NOT find 'Exit to Log In Screen' on screen!")
+
+        await self.pausable_wait(2.0)
+
+    async def reconnect(self):
+        """
+        Reconnect-wait task: wait out the load screen, then for HP >= 50%
+        before potions are used again. Returns the last HP fill read. While
+        paused it neither reads nor brings the game window to the front;
+        stop() ends it at the next check, as it does the sample task.
+        """
+        self.log_message("Waiting for HP or MP to reappear (load screen) ...")
+        hp = 0
+        while self.monitoring:
+            if self.paused:
+                self.publish(status="Status: Paused")
+                await self.pausable_wait(1.0)
+                continue
+            if self.window.find():
+                try:
+                    self.window.bring_to_front()
+                except Exception as e:
+                    self.log_message(f"Error setting foreground: {e}")
+            hp, mp = self.read_fills()
+            self.publish(hp_fill=hp, mp_fill=mp)
+            if hp > 1 or mp > 1:
+                self.log_message("HP/MP found (loading complete).")
+                break
+            await self.pausable_wait(1.0)
+        if not self.monitoring:
+            return hp
+
+        self.log_message("Waiting until HP >= 50% before using potions.")
+        while self.monitoring:
+            if self.paused:
+                self.publish(status="Status: Paused")
+                await self.pausable_wait(1.0)
+                continue
+            hp, mp = self.read_fills()
+            self.publish(hp_fill=hp, mp_fill=mp)
+            if hp >= 50:
+                self.log_message("HP >= 50, resuming normal potion usage.")
+                return hp
+            await self.pausable_wait(1.0)
+        return hp
+
+
+# ------------------------------------------------------------------------------
+# Command line (headless monitor)
+# ------------------------------------------------------------------------------
+def main(argv=None):
+    global CONFIG_FILE
+    parser = argparse.ArgumentParser(description="Run the potion monitor without the GUI.")
+    parser.add_argument("--config", default=CONFIG_FILE, help="settings file saved by the GUI")
+    parser.add_argument("--capture", choices=("gdi", "screen", "replay"),
+                        help="override CAPTURE_BACKEND")
+    parser.add_argument("--replay", help="image file or folder to replay (implies --capture replay)")
+    parser.add_argument("--dry-run", action="store_true", help="log key presses instead of sending them")
+    parser.add_argument("--seconds", type=float, help="stop after this long")
+    parser.add_argument("--profile", metavar="PATH", help="profile the hot path and export it here")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.config):
+        parser.error(f"{args.config} not found; set up regions in the GUI first")
+    CONFIG_FILE = args.config
+    load_config()
+    # Overrides stay out of CONFIG so nothing saved or hot reloaded loses or keeps them
+    if args.replay:
+        CONFIG_OVERRIDES.update(CAPTURE_BACKEND="replay", REPLAY_PATH=args.replay)
+    elif args.capture:
+        CONFIG_OVERRIDES["CAPTURE_BACKEND"] = args.capture
+    backend = session_config().get("CAPTURE_BACKEND", DEFAULT_CAPTURE_BACKEND)
+    if not CONFIG.get("HP_REGION") or not CONFIG.get("MP_REGION"):
+        parser.error("HP_REGION/MP_REGION are not set in the config")
+    compile_config()
+
+    sink = LogSink()
+    if args.dry_run or pyautogui is None:
+        input_backend = DryRunInput(sink.log)
+    else:
+        input_backend = PyAutoGuiInput()
+    if args.profile:
+        get_profiler().enabled = True
+
+    # A dry run or a replay must not write what it learns back to the config file
+    exit_locator = None
+    if args.dry_run or backend == "replay":
+        exit_locator = ExitButtonLocator(create_capture_backend())
+    engine = MonitorEngine(get_window_tracker(), create_capture_backend(),
+                           input_backend=input_backend, log=sink.log, exit_locator=exit_locator)
+    if args.seconds:
+        timer = threading.Timer(args.seconds, engine.stop)
+        timer.daemon = True
+        timer.start()
+    sink.log(f"Headless monitor started ({backend} capture, "
+             f"{type(input_backend).__name__}). Ctrl+C stops.")
+    engine.start()
+    try:
+        engine.run()
+    except KeyboardInterrupt:
+        pass  # asyncio.run() has already cancelled the engine's tasks
+    if engine.skipped_presses:
+        sink.log(f"Skipped {engine.skipped_presses} presses on empty flasks.")
+    if args.profile:
+        engine.profiler.export(args.profile)
+        sink.log(engine.profiler.summary())
+        sink.log(f"Profile written to {args.profile}")
+    sink.close()
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()  # detector process in frozen builds
+    main()
@@ -0,0 +1,368 @@
+"""
+Synthetic game simulator: runs the real MonitorEngine against a virtual world.
+
+    python simulate.py [--scenario burst|dot|poison|mixed] [--hours H] [--seed N]
+
+The world renders HP/MP bars into a small virtual screen, applies scripted
+damage (burst hits, damage over time, poison turning the HP bar green),
+heals over time when the potion keys are pressed (each use spends flask
+charges, drawn in two flask slots, that refill over time) and shows the
+"Exit to Log In Screen" button after ESC. The engine sees it through injected
+capture, input, window and clock objects. The clock is virtual, so
+sleeping only advances the world and hours of play take seconds.
+
+Reported: reaction latency (true HP crossing the lower threshold -> potion
+key pressed), missed potions (dips that ended without a press), deaths,
+dropped inputs, presses wasted on empty flasks and presses the engine
+skipped for them, chickens and false chickens (a threshold chicken while
+the frame the decision was based on showed HP above the chicken threshold,
+or a trend chicken while no damage was still being dealt), and the lead
+time of potions fired on the HP trend before the threshold was crossed.
+HP trend prediction follows PREDICT_ENABLED from the default config (off,
+as shipped); compare runs with --predict to see what it gains, and with
+--no-flask-check to see the presses the charge reader saves.
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import cv2
+import numpy as np
+
+import poeengine as bot
+
+SCREEN_W, SCREEN_H = 640, 360
+HP_REGION = [20, 220, 60, 120]
+MP_REGION = [560, 220, 60, 120]
+FLASK_REGIONS = {"1": [270, 290, 30, 60], "2": [340, 290, 30, 60]}
+EXIT_BUTTON_POS = (120, 150)
+
+def bgra(b, g, r):
+    """One BGRA pixel as the uint32 the screen's packed view stores."""
+    return np.array((b, g, r, 255), np.uint8).view(np.uint32)[0]
+
+RED = bgra(60, 60, 240)
+GREEN = bgra(40, 170, 40)
+BLUE = bgra(230, 110, 50)
+EMPTY = bgra(25, 22, 20)
+BLACK = bgra(0, 0, 0)
+
+STEP = 0.005             # world integration step (s)
+REGEN_RATE = 1.0         # HP%/s natural regeneration
+MANA_DRAIN = 4.0         # MP%/s while "casting"
+FLASK_HEAL = 50.0        # HP% (or MP%) restored per flask
+FLASK_DURATION = 1.0     # seconds over which a flask heals
+FLASK_USE_COST = 30.0    # charge % one flask use needs
+FLASK_CHARGE_RATE = 8.0  # charge %/s gained (kills) while online
+RESPAWN_TIME = 5.0       # seconds dead before respawning
+LOGIN_TIME = 3.0         # seconds on the load screen after a chicken
+MENU_DELAY = 0.1         # seconds between ESC and the menu being drawn
+
+
+class World:
+    """The simulated character and what the game would draw for it."""
+
+    def __init__(self, scenario, rng, drop_rate):
+        self.scenario = scenario
+        self.rng = rng
+        self.drop_rate = drop_rate
+        self.t = 0.0
+        self.hp = 100.0
+        self.mp = 100.0
+        self.poisoned = False
+        self.dot_rate = 0.0
+        self.dot_until = 0.0
+        self.next_event = 2.0
+        self.heal_until = {"1": 0.0, "2": 0.0}  # flask key -> end of its heal
+        self.charges = {"1": 100.0, "2": 100.0}  # flask key -> charge %
+        self.offline_until = 0.0         # dead or logging back in
+        self.exit_template = None
+        self.menu_at = None              # when the ESC menu finishes opening
+        self.screen = np.zeros((SCREEN_H, SCREEN_W, 4), np.uint8)
+        self._packed = self.screen.view(np.uint32)[..., 0]  # one uint32 per pixel
+        self._drawn = {}
+
+        self.stats = {"deaths": 0, "chickens": 0, "dropped": 0,
+                      "presses": 0, "missed": 0, "wasted": 0}
+        self.reactions = []
+        self.dip_start = None
+        self.dip_pressed = False
+
+    # -- damage script -----------------------------------------------------
+    def _schedule(self):
+        kind = self.scenario
+        if kind == "mixed":
+            kind = self.rng.choice(("burst", "dot", "poison"))
+        if kind == "burst":
+            self.hp -= self.rng.uniform(20, 45)
+        else:
+            self.dot_rate = self.rng.uniform(8, 20)
+            self.dot_until = self.t + self.rng.uniform(3, 8)
+            self.poisoned = kind == "poison"
+        self.next_event = self.t + self.rng.uniform(2, 6)
+
+    def advance(self, dt, low_threshold):
+        end = self.t + dt
+        while self.t < end:
+            step = min(STEP, end - self.t)
+            self.t += step
+            if self.t < self.offline_until:
+                continue
+            if self.hp <= 0:
+                self.hp, self.mp = 100.0, 100.0  # respawned / logged back in
+            if self.t >= self.next_event:
+                self._schedule()
+            if self.t < self.dot_until:
+                self.hp -= self.dot_rate * step
+            else:
+                self.poisoned = False
+            self.hp += REGEN_RATE * step
+            self.mp -= MANA_DRAIN * step
+            if self.t < self.heal_until["1"]:
+                self.hp += FLASK_HEAL / FLASK_DURATION * step
+            if self.t < self.heal_until["2"]:
+                self.mp += FLASK_HEAL / FLASK_DURATION * step
+            for key in self.charges:
+                self.charges[key] = min(self.charges[key] + FLASK_CHARGE_RATE * step, 100.0)
+            self.hp = min(self.hp, 100.0)
+            self.mp = min(max(self.mp, 0.0), 100.0)
+            self._track_dip(low_threshold)
+            if self.hp <= 0:
+                self.stats["deaths"] += 1
+                self._end_dip()
+                self.offline_until = self.t + RESPAWN_TIME
+
+    # -- metrics -------------------------------------------------------------
+    def _track_dip(self, low_threshold):
+        if self.hp < low_threshold and self.dip_start is None:
+            self.dip_start = self.t
+            self.dip_pressed = False
+        elif self.hp >= low_threshold and self.dip_start is not None:
+            self._end_dip()
+
+    def _end_dip(self):
+        if self.dip_start is not None and not self.dip_pressed:
+            self.stats["missed"] += 1
+        self.dip_start = None
+
+    # -- what the bot sees and does ----------------------------------------
+    def online(self):
+        return self.t >= self.offline_until
+
+    def menu_visible(self):
+        return self.menu_at is not None and self.t >= self.menu_at
+
+    def render(self):
+        """The virtual screen as BGRA; only the parts that changed are redrawn."""
+        online = self.online()
+        hp_rows = int(round(max(self.hp, 0) / 100 * HP_REGION[3])) if online else 0
+        mp_rows = int(round(self.mp / 100 * MP_REGION[3])) if online else 0
+        menu = online and self.menu_visible()
+        parts = {
+            "hp": (HP_REGION, online, hp_rows, GREEN if self.poisoned else RED),
+            "mp": (MP_REGION, online, mp_rows, BLUE),
+        }
+        for key, color in (("1", RED), ("2", BLUE)):
+            self._draw_flask(key, FLASK_REGIONS[key], self.charges[key] if online else 0.0, color)
+        for name, (region, bar_online, rows, color) in parts.items():
+            if self._drawn.get(name) == (bar_online, rows, color):
+                continue
+            x, y, w, h = region
+            self._packed[y : y + h, x : x + w] = EMPTY if bar_online else BLACK
+            if rows:
+                self._packed[y + h - rows : y + h, x : x + w] = color
+            self._drawn[name] = (bar_online, rows, color)
+        if self._drawn.get("menu") != menu:
+            bh, bw = self.exit_template.shape[:2]
+            bx, by = EXIT_BUTTON_POS
+            self.screen[by : by + bh, bx : bx + bw] = self.exit_template if menu else 0
+            self._drawn["menu"] = menu
+        return self.screen
+
+    def _draw_flask(self, key, region, charge, color):
+        """Liquid filling the bottom of the flask silhouette, `charge`% of its area."""
+        x, y, w, h = region
+        mask = bot.flask_slot_mask(w, h)
+        filled = np.cumsum(mask.sum(axis=1)[::-1])  # mask pixels at or below each row
+        rows = int(np.searchsorted(filled, charge / 100 * filled[-1]))
+        if self._drawn.get(key) == rows:
+            return
+        liquid = mask.copy()
+        liquid[: h - rows] = False
+        slot = self._packed[y : y + h, x : x + w]
+        slot[...] = BLACK
+        slot[mask] = EMPTY
+        slot[liquid] = color
+        self._drawn[key] = rows
+
+    def press(self, key):
+        if self.rng.random() < self.drop_rate:
+            self.stats["dropped"] += 1
+            return
+        if key == "esc":
+            if self.online():
+                self.menu_at = self.t + MENU_DELAY
+            return
+        self.stats["presses"] += 1
+        if key == "1" and self.dip_start is not None and not self.dip_pressed:
+            self.dip_pressed = True
+            self.reactions.append(self.t - self.dip_start)
+        if key in self.heal_until:
+            if self.charges[key] < FLASK_USE_COST:
+                self.stats["wasted"] += 1
+                return
+            self.charges[key] -= FLASK_USE_COST
+            # a new flask restarts the heal instead of stacking
+            self.heal_until[key] = self.t + FLASK_DURATION
+
+    def click(self, x, y):
+        bh, bw = self.exit_template.shape[:2]
+        bx, by = EXIT_BUTTON_POS
+        if self.menu_visible() and bx <= x < bx + bw and by <= y < by + bh:
+            self.stats["chickens"] += 1
+            self.menu_at = None
+            self._end_dip()
+            self.hp = 0.0  # comes back full after the load screen
+            self.offline_until = self.t + LOGIN_TIME
+
+
+class VirtualClock:
+    """now()/sleep()/wait() over simulated time; sleeping advances the world."""
+
+    def __init__(self, world, duration):
+        self.world = world
+        self.duration = duration
+        self.engine = None
+
+    def now(self):
+        return self.world.t
+
+    def sleep(self, seconds):
+        low = bot.CONFIG.get("THRESHOLD_HP_LOWER", bot.DEFAULT_THRESHOLD_HP_LOWER)
+        self.world.advance(seconds, low)
+        if self.world.t >= self.duration and self.engine is not None:
+            self.engine.stop()
+
+    async def wait(self, seconds, wake=None):
+        # Let the other tasks (the dispatcher) act at the current instant
+        # first; nothing in the virtual world sets `wake`.
+        await asyncio.sleep(0)
+        self.sleep(seconds)
+
+
+class SimCapture:
+    """Capture backend that crops the world's virtual screen."""
+
+    def __init__(self, world):
+        self.world = world
+        self.last_hp = 100.0
+
+    def grab(self, regions):
+        box = bot.regions_bbox(regions)
+        if box is None:
+            return None
+        x, y, w, h = box
+        self.last_hp = self.world.hp
+        return bot.Frame(self.world.render()[y : y + h, x : x + w], x, y)
+
+    def close(self):
+        pass
+
+
+class SimInput:
+    def __init__(self, world):
+        self.world = world
+
+    def press(self, key):
+        self.world.press(key)
+
+    def click(self, x, y):
+        self.world.click(x, y)
+
+
+def percentiles_ms(values):
+    if not values:
+        return "-"
+    p50, p95, p99 = np.percentile(values, (50, 95, 99))
+    return (f"p50 {p50 * 1000:.0f} ms, p95 {p95 * 1000:.0f} ms, "
+            f"p99 {p99 * 1000:.0f} ms, max {max(values) * 1000:.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenario", choices=("burst", "dot", "poison", "mixed"), default="mixed")
+    parser.add_argument("--hours", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--drop-rate", type=float, default=0.02,
+                        help="fraction of key presses the game ignores")
+    parser.add_argument("--no-chicken", action="store_true")
+    parser.add_argument("--predict", action="store_true",
+                        help="enable HP trend prediction (off in the default config)")
+    parser.add_argument("--no-flask-check", action="store_true",
+                        help="press even when the flask reads empty")
+    parser.add_argument("--verbose", action="store_true", help="print the engine log")
+    args = parser.parse_args()
+
+    random.seed(args.seed)  # the engine's random thresholds
+    bot.CONFIG.clear()
+    bot.CONFIG.update(bot.default_config())
+    bot.CONFIG.update({"HP_REGION": HP_REGION, "MP_REGION": MP_REGION,
+                       "CHICKEN_ENABLED": not args.no_chicken,
+                       "PREDICT_ENABLED": args.predict or bot.CONFIG["PREDICT_ENABLED"],
+                       "FLASK_REGIONS": FLASK_REGIONS,
+                       "FLASK_CHECK_ENABLED": not args.no_flask_check,
+                       "FLASK_MIN_CHARGE": FLASK_USE_COST})
+    bot.compile_config()
+
+    world = World(args.scenario, random.Random(args.seed), args.drop_rate)
+    exit_gray = bot.get_template_store().get(*bot.EXIT_TEMPLATE).gray
+    world.exit_template = cv2.cvtColor(exit_gray, cv2.COLOR_GRAY2BGRA)
+
+    duration = args.hours * 3600
+    clock = VirtualClock(world, duration)
+    capture = SimCapture(world)
+    sim_input = SimInput(world)
+    false_chickens = []
+    trend_chickens = []
+
+    def log(msg):
+        if msg.endswith("=> chickening out!"):
+            if capture.last_hp >= bot.CONFIG["CHICKEN_THRESHOLD"] + 1:
+                false_chickens.append(world.t)
+        elif msg.endswith("=> chickening out early!"):
+            trend_chickens.append(world.t)
+            if world.t >= world.dot_until:  # the drop that triggered it had stopped
+                false_chickens.append(world.t)
+        if args.verbose:
+            print(f"[{world.t:9.2f}] {msg}")
+
+    engine = bot.MonitorEngine(
+        bot.FakeWindowTracker(rect=(0, 0, SCREEN_W, SCREEN_H)), capture,
+        input_backend=sim_input, clock=clock, log=log,
+        exit_locator=bot.ExitButtonLocator(capture, clock))
+    clock.engine = engine
+
+    wall = time.perf_counter()
+    engine.start()
+    engine.run()
+    wall = time.perf_counter() - wall
+
+    stats = world.stats
+    print(f"Scenario {args.scenario}: {duration / 3600:.2f} h simulated in {wall:.1f} s "
+          f"({duration / wall:.0f}x)")
+    print(f"  reaction latency : {percentiles_ms(world.reactions)} over {len(world.reactions)} dips")
+    print(f"  potion presses   : {stats['presses']} (dropped by game: {stats['dropped']})")
+    print(f"  missed potions   : {stats['missed']}")
+    print(f"  empty flasks     : {stats['wasted']} presses wasted, "
+          f"{engine.skipped_presses} skipped by the engine")
+    print(f"  deaths           : {stats['deaths']}")
+    print(f"  chickens         : {stats['chickens']} (false: {len(false_chickens)}, "
+          f"on the trend: {len(trend_chickens)})")
+    print(f"  chicken latency  : {percentiles_ms(list(engine.chicken_latency.samples))}")
+    print(f"  predictive lead  : {percentiles_ms(list(engine.lead_times.samples))} "
+          f"over {engine.early_presses} early presses")
+
+
+if __name__ == "__main__":
+    main()
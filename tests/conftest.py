@@ -0,0 +1,56 @@
+"""
+Shared fixtures. The engine keeps its settings in module globals, so every
+test starts from default_config() with config.json redirected to a temp dir.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import poeengine as bot  # noqa: E402
+
+ASSET_DIR = bot.SCRIPT_DIR
+
+
+class ManualClock:
+    """Clock that only moves when a test calls advance()."""
+    def __init__(self, start=100.0):
+        self.t = start
+
+    def now(self):
+        return self.t
+
+    def sleep(self, seconds):
+        self.t += seconds
+
+    async def wait(self, seconds, wake=None):
+        self.t += seconds
+
+    def advance(self, seconds):
+        self.t += seconds
+
+
+@pytest.fixture(autouse=True)
+def default_settings(tmp_path, monkeypatch):
+    monkeypatch.setattr(bot, "CONFIG_FILE", str(tmp_path / "config.json"))
+    monkeypatch.setattr(bot, "_config_mtime", None)
+    monkeypatch.setattr(bot, "_settings", None)
+    bot.CONFIG.clear()
+    bot.CONFIG.update(bot.default_config())
+    bot.CONFIG_OVERRIDES.clear()
+    bot.compile_config()
+    yield
+    bot.CONFIG.clear()
+    bot.CONFIG_OVERRIDES.clear()
+
+
+@pytest.fixture
+def clock():
+    return ManualClock()
+
+
+def load_frame(name):
+    """A bundled screenshot as a replayed Frame."""
+    return bot.ReplayCapture(os.path.join(ASSET_DIR, name)).grab([])
@@ -0,0 +1,50 @@
+import cv2
+import numpy as np
+import pytest
+
+import poeengine as bot
+from conftest import load_frame
+
+ASSETS = ["health.png", "mana.png", "death_screen.png", "gears_angle1.png"]
+
+
+def inrange_masks(bgr, tighten):
+    """The detectors' original per-tick test: HSV conversion + inRange."""
+    hsv = cv2.cvtColor(bgr, cv2.COLOR_BGR2HSV)
+    red = cv2.bitwise_or(cv2.inRange(hsv, np.array([0, 50, 50]), np.array([10, 255, 255])),
+                         cv2.inRange(hsv, np.array([160, 50, 50]), np.array([180, 255, 255])))
+    green = cv2.inRange(hsv, np.array([40, 50, 50]), np.array([80, 255, 255]))
+    blue_lo, blue_hi = bot.blue_hue_bounds(tighten)
+    blue = cv2.inRange(hsv, np.array([blue_lo, 50, 50]), np.array([blue_hi, 255, 255]))
+    dark = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY) < bot.GRAY_EMPTY_THRESHOLD
+    return {bot.CLASS_RED: red > 0, bot.CLASS_GREEN: green > 0,
+            bot.CLASS_BLUE: blue > 0, bot.CLASS_DARK: dark}
+
+
+@pytest.fixture(scope="module", params=[0, 100])
+def classifier(request):
+    return bot.ColorClassifier(request.param)
+
+
+@pytest.mark.parametrize("name", ASSETS)
+def test_table_labels_like_the_hsv_test(classifier, name):
+    pixels = load_frame(name).pixels
+    labels = classifier.label(pixels)
+    expected = inrange_masks(cv2.cvtColor(pixels, cv2.COLOR_BGRA2BGR), classifier.tighten)
+    for flag, mask in expected.items():
+        assert np.array_equal((labels & flag) > 0, mask), flag
+
+
+def test_label_value_matches_label(classifier):
+    pixels = load_frame("death_screen.png").pixels
+    packed = pixels.view(np.uint32)[..., 0]
+    labels = classifier.label(pixels)
+    for y, x in [(0, 0), (10, 40), (packed.shape[0] - 1, packed.shape[1] - 1)]:
+        assert classifier.label_value(packed.item(y, x)) == labels[y, x]
+
+
+def test_death_screen_reads_the_hsv_fill():
+    frame = load_frame("death_screen.png")
+    h, w = frame.pixels.shape[:2]
+    red = inrange_masks(cv2.cvtColor(frame.pixels, cv2.COLOR_BGRA2BGR), 0)[bot.CLASS_RED]
+    assert bot.get_health_fill_percentage([0, 0, w, h], frame) == pytest.approx(red.mean() * 100)
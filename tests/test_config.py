@@ -0,0 +1,104 @@
+import json
+import os
+
+import pytest
+
+import poeengine as bot
+
+
+def edit_on_disk(**changes):
+    """Rewrite config.json as another program would, with a newer mtime."""
+    with open(bot.CONFIG_FILE) as f:
+        config = json.load(f)
+    config.update(changes)
+    with open(bot.CONFIG_FILE, "w") as f:
+        json.dump(config, f)
+    stat = os.stat(bot.CONFIG_FILE)
+    os.utime(bot.CONFIG_FILE, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+
+def test_snapshot_is_immutable():
+    settings = bot.get_settings()
+    with pytest.raises(AttributeError):
+        settings.hp_lower = 10
+
+
+def test_compile_swaps_in_a_new_snapshot():
+    before = bot.get_settings()
+    bot.CONFIG["THRESHOLD_HP_LOWER"] = 33
+    assert before.hp_lower == bot.DEFAULT_THRESHOLD_HP_LOWER  # old snapshot unchanged
+    after = bot.compile_config()
+    assert after is bot.get_settings() and after is not before
+    assert after.hp_lower == 33.0
+
+
+def test_regions_are_validated():
+    bot.CONFIG.update(HP_REGION=[1, 2, 3, 4], MP_REGION=[1, 2])
+    settings = bot.compile_config()
+    assert settings.hp_region == (1, 2, 3, 4)
+    assert settings.mp_region is None
+    assert settings.capture_regions == [(1, 2, 3, 4)]
+
+
+def test_color_table_is_carried_over_until_tightening_changes():
+    first = bot.compile_config()
+    classifier = first.classifier
+    assert bot.compile_config().classifier is classifier
+    bot.CONFIG["COLOR_TIGHTENING"] = 50
+    assert bot.compile_config()._classifier is None
+
+
+def test_load_fills_in_keys_missing_from_an_older_file():
+    with open(bot.CONFIG_FILE, "w") as f:
+        json.dump({"THRESHOLD_HP_LOWER": 40}, f)
+    bot.load_config()
+    assert bot.CONFIG["THRESHOLD_HP_LOWER"] == 40
+    assert bot.CONFIG["CAPTURE_BACKEND"] == bot.DEFAULT_CAPTURE_BACKEND
+
+
+def test_no_reload_before_load_or_without_changes():
+    assert bot.read_changed_config() is None
+    bot.save_config()
+    assert bot.read_changed_config() is None
+
+
+def test_changed_file_is_read_without_touching_config():
+    bot.save_config()
+    shared = bot.CONFIG
+    edit_on_disk(THRESHOLD_HP_LOWER=21)
+    config, settings = bot.read_changed_config()
+    assert config["THRESHOLD_HP_LOWER"] == 21 and settings.hp_lower == 21.0
+    assert bot.CONFIG["THRESHOLD_HP_LOWER"] == bot.DEFAULT_THRESHOLD_HP_LOWER
+    assert bot.read_changed_config() is None  # reported once
+
+    bot.install_config(config, settings)
+    assert bot.CONFIG is shared  # the GUI shares this dict
+    assert bot.CONFIG["THRESHOLD_HP_LOWER"] == 21
+    assert bot.get_settings() is settings
+
+
+def test_half_written_file_is_retried():
+    bot.save_config()
+    stat = os.stat(bot.CONFIG_FILE)
+    with open(bot.CONFIG_FILE, "w") as f:
+        f.write('{"THRESHOLD_HP_LOWER": ')
+    os.utime(bot.CONFIG_FILE, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert bot.read_changed_config() is None
+    bot.CONFIG["THRESHOLD_HP_LOWER"] = 22
+    with open(bot.CONFIG_FILE, "w") as f:
+        json.dump(bot.CONFIG, f)
+    os.utime(bot.CONFIG_FILE, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2 * 10**9))
+    assert bot.read_changed_config()[1].hp_lower == 22.0
+
+
+def test_engine_hands_reloads_to_post_config(clock):
+    bot.save_config()
+    posted = []
+    engine = bot.MonitorEngine(bot.FakeWindowTracker(), None, input_backend=bot.DryRunInput(print),
+                               clock=clock, log=lambda msg: None,
+                               exit_locator=bot.ExitButtonLocator(None),
+                               post_config=lambda config, settings: posted.append(settings))
+    edit_on_disk(THRESHOLD_HP_LOWER=23)
+    engine.reload_if_changed()
+    assert [settings.hp_lower for settings in posted] == [23.0]
+    assert bot.CONFIG["THRESHOLD_HP_LOWER"] == bot.DEFAULT_THRESHOLD_HP_LOWER
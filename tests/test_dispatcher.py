@@ -0,0 +1,53 @@
+import asyncio
+
+import poeengine as bot
+
+
+def make_dispatcher(clock):
+    pressed = []
+    return bot.ActionDispatcher(pressed.append, clock), pressed
+
+
+def test_cooldown_blocks_repeat_presses(clock):
+    dispatcher, pressed = make_dispatcher(clock)
+    assert dispatcher.request("Health", "1", 0.5)
+    clock.advance(0.4)
+    assert not dispatcher.request("Health", "1", 0.5)
+    assert dispatcher.cooling_down("Health")
+    clock.advance(0.1)
+    assert not dispatcher.cooling_down("Health")
+    assert dispatcher.request("Health", "1", 0.5)
+    assert pressed == ["1", "1"]
+
+
+def test_resources_cool_down_independently(clock):
+    dispatcher, pressed = make_dispatcher(clock)
+    assert dispatcher.request("Health", "1", 5.0)
+    assert dispatcher.request("Mana", "2", 5.0)
+    assert not dispatcher.request("Health", "1", 5.0)
+    assert pressed == ["1", "2"]
+
+
+def test_reset_cooldown_allows_an_immediate_retry(clock):
+    dispatcher, pressed = make_dispatcher(clock)
+    dispatcher.request("Health", "1", 5.0)
+    dispatcher.reset_cooldown("Health")
+    assert dispatcher.request("Health", "1", 5.0)
+    assert pressed == ["1", "1"]
+
+
+def test_running_dispatcher_sends_from_its_task(clock):
+    dispatcher, pressed = make_dispatcher(clock)
+
+    async def scenario():
+        task = asyncio.create_task(dispatcher.run())
+        await asyncio.sleep(0)
+        assert dispatcher.request("Health", "1", 0.5)
+        assert pressed == []  # queued, not sent inline
+        await asyncio.sleep(0)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(scenario())
+    assert pressed == ["1"]
+    assert dispatcher.actions is None
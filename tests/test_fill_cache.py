@@ -0,0 +1,84 @@
+import poeengine as bot
+from conftest import load_frame
+
+
+class CountingReader:
+    def __init__(self, value=42.0):
+        self.value = value
+        self.calls = 0
+
+    def __call__(self, region, frame):
+        self.calls += 1
+        return self.value
+
+
+def region_of(frame):
+    h, w = frame.pixels.shape[:2]
+    return (0, 0, w, h)
+
+
+def test_unchanged_pixels_reuse_the_last_value():
+    frame = load_frame("health.png")
+    cache, reader = bot.FillCache(), CountingReader()
+    assert cache.read("HP", region_of(frame), frame, reader) == 42.0
+    assert cache.read("HP", region_of(frame), frame, reader) == 42.0
+    assert reader.calls == 1
+    assert cache.skip_rate() == 0.5
+
+
+def test_changed_pixels_are_read_again():
+    frame = load_frame("health.png")
+    cache, reader = bot.FillCache(), CountingReader()
+    cache.read("HP", region_of(frame), frame, reader)
+    changed = bot.Frame(frame.pixels.copy())
+    changed.pixels[:, :] = (0, 0, 255, 255)
+    reader.value = 10.0
+    assert cache.read("HP", region_of(frame), changed, reader) == 10.0
+    assert reader.calls == 2
+
+
+def test_detection_settings_change_invalidates():
+    frame = load_frame("health.png")
+    cache, reader = bot.FillCache(), CountingReader()
+    cache.read("HP", region_of(frame), frame, reader)
+    bot.CONFIG["USE_GRAY_AS_EMPTY"] = True
+    bot.compile_config()
+    cache.read("HP", region_of(frame), frame, reader)
+    assert reader.calls == 2
+
+
+def test_region_change_invalidates():
+    frame = load_frame("health.png")
+    cache, reader = bot.FillCache(), CountingReader()
+    x, y, w, h = region_of(frame)
+    cache.read("HP", (x, y, w, h), frame, reader)
+    cache.read("HP", (x, y, w, h - 1), frame, reader)
+    assert reader.calls == 2
+
+
+def test_regions_are_cached_separately():
+    frame = load_frame("health.png")
+    cache, reader = bot.FillCache(), CountingReader()
+    cache.read("HP", region_of(frame), frame, reader)
+    cache.read("MP", region_of(frame), frame, reader)
+    assert reader.calls == 2
+
+
+def test_skip_unchanged_off_always_reads():
+    bot.CONFIG["SKIP_UNCHANGED_REGIONS"] = False
+    bot.compile_config()
+    frame = load_frame("health.png")
+    cache, reader = bot.FillCache(), CountingReader()
+    cache.read("HP", region_of(frame), frame, reader)
+    cache.read("HP", region_of(frame), frame, reader)
+    assert reader.calls == 2
+
+
+def test_reset_forgets_entries_and_counts():
+    frame = load_frame("health.png")
+    cache, reader = bot.FillCache(), CountingReader()
+    cache.read("HP", region_of(frame), frame, reader)
+    cache.reset()
+    assert cache.skip_rate() == 0.0
+    cache.read("HP", region_of(frame), frame, reader)
+    assert reader.calls == 2
@@ -0,0 +1,60 @@
+import pytest
+
+import poeengine as bot
+
+
+@pytest.fixture
+def ring():
+    ring = bot.FillRing(slots=4)
+    yield ring
+    ring.close()
+
+
+def test_empty_ring_has_no_sample(ring):
+    assert ring.latest() is None
+    assert ring.since(0) == []
+
+
+def test_latest_returns_the_newest_write(ring):
+    ring.write(1.0, 80.0, 60.0, False, {"1": 75.0})
+    ring.write(2.0, 70.0, 50.0, True)
+    sample = ring.latest()
+    assert (sample.seq, sample.time, sample.hp, sample.mp, sample.poisoned) == (2, 2.0, 70.0, 50.0, True)
+    assert sample.flasks == {}  # flask slots not read come back absent, not NaN
+
+
+def test_flask_charges_round_trip(ring):
+    ring.write(1.0, 80.0, 60.0, False, {"1": 75.0, "2": 20.0})
+    assert ring.latest().flasks == {"1": 75.0, "2": 20.0}
+
+
+def test_since_skips_samples_already_overwritten(ring):
+    for i in range(1, 7):
+        ring.write(float(i), float(i), 0.0, False)
+    assert [s.seq for s in ring.since(0)] == [3, 4, 5, 6]
+    assert [s.seq for s in ring.since(5)] == [6]
+
+
+def test_reader_attached_by_name_sees_the_writer(ring):
+    reader = bot.FillRing(ring.name, slots=ring.slots)
+    try:
+        ring.write(1.0, 42.0, 0.0, False)
+        assert reader.latest().hp == 42.0
+    finally:
+        reader.close()
+
+
+def test_slot_being_written_is_not_returned(ring):
+    ring.write(1.0, 80.0, 60.0, False)
+    ring.write(2.0, 70.0, 50.0, False)
+    # The writer zeroes a slot's sequence number while it fills the slot in
+    ring.ring[2 % ring.slots]["seq"] = 0
+    assert ring._read(2) is None
+    assert [s.seq for s in ring.since(0)] == [1]
+
+
+def test_slot_reused_for_a_newer_sample_is_not_returned(ring):
+    for i in range(1, 6):  # seq 5 overwrites seq 1's slot
+        ring.write(float(i), float(i), 0.0, False)
+    assert ring._read(1) is None
+    assert ring._read(5).hp == 5.0
@@ -0,0 +1,61 @@
+import pytest
+
+import poeengine as bot
+
+
+def feed(trend, fills, start=0.0, step=0.05):
+    for i, fill in enumerate(fills):
+        trend.add(fill, start + i * step)
+
+
+def test_slope_of_a_steady_drop():
+    trend = bot.HpTrend()
+    feed(trend, [80, 78, 76, 74, 72])  # -2 per 50 ms
+    assert trend.slope() == pytest.approx(-40.0)
+    assert trend.project(0.1) == pytest.approx(68.0)
+    assert trend.time_to_zero() == pytest.approx(72 / 40)
+
+
+def test_too_few_samples_have_no_slope():
+    trend = bot.HpTrend()
+    feed(trend, [80, 70])
+    assert trend.slope() == 0.0
+    assert trend.project(1.0) == 70
+
+
+def test_rising_bar_is_not_extrapolated():
+    trend = bot.HpTrend()
+    feed(trend, [40, 45, 50, 55])
+    assert trend.project(1.0) == 55
+    assert trend.time_to_zero() == float("inf")
+
+
+def test_samples_older_than_the_window_are_ignored():
+    trend = bot.HpTrend(window=0.2)
+    feed(trend, [100, 90, 80], step=0.05)
+    feed(trend, [50, 50, 50, 50, 50], start=1.0)  # flat after a gap
+    assert trend.slope() == 0.0
+
+
+def test_ring_keeps_only_the_newest_samples():
+    trend = bot.HpTrend(size=4, window=10.0)
+    feed(trend, [10, 20, 30, 40, 90, 80, 70, 60])
+    assert trend.latest() == 60
+    assert trend.slope() < 0
+
+
+def test_falling_needs_every_recent_step_to_drop():
+    trend = bot.HpTrend()
+    feed(trend, [80, 70, 60, 50])
+    assert trend.falling(3)
+    trend.add(50, 0.2)  # a repeated frame: the burst may be over
+    assert not trend.falling(3)
+    assert trend.slope() < 0  # the fitted slope still looks steep
+
+
+def test_reset_forgets_samples():
+    trend = bot.HpTrend()
+    feed(trend, [80, 70, 60, 50])
+    trend.reset()
+    assert trend.latest() == 0.0
+    assert not trend.falling()
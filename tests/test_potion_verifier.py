@@ -0,0 +1,62 @@
+import poeengine as bot
+
+
+def test_rise_confirms_with_latency():
+    verifier = bot.PotionVerifier(window=0.5)
+    verifier.pressed(40.0, 10.0)
+    assert verifier.update(39.0, 10.1) is None  # still dropping: the low moves down
+    assert verifier.update(39.0 + bot.VERIFY_MIN_RISE, 10.2) == "confirmed"
+    assert verifier.last_latency() == 10.2 - 10.0
+    assert verifier.suppressing()
+
+
+def test_no_rise_within_window_is_missed():
+    verifier = bot.PotionVerifier(window=0.5)
+    verifier.pressed(40.0, 10.0)
+    assert verifier.update(40.0, 10.3) is None
+    assert verifier.update(40.0, 10.6) == "missed"
+    assert not verifier.suppressing()
+
+
+def test_recovery_ends_when_the_fill_stalls():
+    verifier = bot.PotionVerifier(window=0.5)
+    verifier.pressed(40.0, 0.0)
+    verifier.update(50.0, 0.1)
+    assert verifier.update(55.0, 0.2) is None
+    assert verifier.update(55.0, 0.2 + bot.RECOVERY_STALL_TIME / 2) is None
+    assert verifier.update(55.0, 0.3 + bot.RECOVERY_STALL_TIME) == "recovered"
+    assert not verifier.suppressing()
+
+
+def test_recovery_ends_when_damage_outpaces_the_flask():
+    verifier = bot.PotionVerifier(window=0.5)
+    verifier.pressed(40.0, 0.0)
+    verifier.update(50.0, 0.1)
+    assert verifier.update(50.0 - bot.VERIFY_MIN_RISE - 1, 0.15) == "recovered"
+
+
+def test_latency_history_is_bounded():
+    verifier = bot.PotionVerifier(window=0.5)
+    for i in range(bot.VERIFY_LATENCY_SAMPLES + 10):
+        verifier.pressed(40.0, float(i))
+        verifier.update(40.0 + bot.VERIFY_MIN_RISE, i + 0.1)
+        verifier.reset()
+    assert len(verifier.latencies) == bot.VERIFY_LATENCY_SAMPLES
+
+
+class FakeCapture:
+    def grab(self, regions):
+        return None
+
+
+def test_engine_retries_a_missed_press(clock):
+    pressed = []
+    engine = bot.MonitorEngine(bot.FakeWindowTracker(), FakeCapture(),
+                               input_backend=bot.DryRunInput(pressed.append), clock=clock,
+                               log=lambda msg: None)
+    engine.start()
+    assert engine.use_potion("1", 40.0, "Health", 5.0)
+    assert not engine.use_potion("1", 40.0, "Health", 5.0)  # cooling down
+    clock.advance(engine.verifiers["Health"].window + 0.1)
+    engine.verify_potions(40.0, 100.0)  # no rise: missed, cooldown reset
+    assert engine.use_potion("1", 40.0, "Health", 5.0)